@@ -5,11 +5,32 @@ import {
     resetVisualiser,
     updateVisualiser
   } from "./visualiser.js";
+  import {
+    parseAudioFrame,
+    unpackOpusPackets,
+    CODEC_PCM16,
+    CODEC_OPUS
+  } from "./framing.js";
+  import { PlaybackScheduler } from "./scheduler.js";
   
   let startRadioBtn, startCallBtn, endCallBtn, textOutput;
   let ws = null;          // WebSocket for caller stream
   let hostWS = null;      // WebSocket for host (Matt/Mollie) TTS
   let audioContext = null;
+  let hostScheduler = null;   // places host chunks at their presentation timestamps
+  let callerScheduler = null; // plays caller chunks back to back
+  let opusDecoder = null; // WebCodecs decoder for compressed host audio
+  let hostCodec = null;   // "&codec=opus" once we know the browser can decode it
+  let lastHostSeq = null; // last host frame received, so reconnects can resume
+  let queueVersion = 0;   // version of the last queue event applied
+  let queueOrder = [];    // item ids in queue order
+  let queueRows = new Map(); // item id -> row element
+  let queueSource = null; // EventSource for queue updates
+  let queueCurrent = 0;   // server's currentIndex (the playing item is currentIndex - 1)
+  // Which station to tune into (?station=<id> on the page URL), the shared one by default
+  const stationId = encodeURIComponent(
+    new URLSearchParams(window.location.search).get("station") || "default"
+  );
   
   window.addEventListener("DOMContentLoaded", () => {
     startRadioBtn = document.getElementById("startRadioBtn");
@@ -24,9 +45,13 @@ import {
     // 1) Init the single host visualiser canvas
     initVisualiser();
   
-    // 2) Periodically load queue from server
-    loadQueue();
-    setInterval(loadQueue, 1000);
+    // 2) Follow the queue: pushed diffs over SSE (polling only if EventSource is missing)
+    if (window.EventSource) {
+      startQueueEvents();
+    } else {
+      loadQueue();
+      setInterval(loadQueue, 1000);
+    }
   
     // 3) Open dedicated WebSocket for the radio hosts (Matt/Mollie) TTS
     startHostStream();
@@ -45,11 +70,15 @@ import {
         await audioContext.resume();
       }
   
-      const res = await fetch("/api/start_radio", { method: "POST" });
+      const res = await fetch(`/api/start_radio?station_id=${stationId}`, { method: "POST" });
       const data = await res.json();
       if (res.ok) {
         logText("Radio started: " + data.message);
-        loadQueue();
+        if (!window.EventSource) {
+          loadQueue();
+        } else if (!queueSource || queueSource.readyState === EventSource.CLOSED) {
+          startQueueEvents();  // the station didn't exist (404) when the page loaded
+        }
       } else {
         logText("Error starting radio: " + JSON.stringify(data));
       }
@@ -59,51 +88,105 @@ import {
   }
   
   /**
-   * Periodically fetch the queue from server
+   * Fallback: fetch a queue snapshot from the server
    */
   async function loadQueue() {
     try {
-      const res = await fetch("/api/queue");
+      const res = await fetch(`/api/queue?station_id=${stationId}`);
       const data = await res.json();
       renderQueue(data.queue, data.currentIndex);
+      queueVersion = data.version;
     } catch (err) {
       console.error("Failed to load queue:", err);
     }
   }
-  
+
   /**
-   * Render the queue in #queueContainer
+   * Subscribe to /api/queue/events. The server sends a "reset" snapshot on
+   * connect, then versioned diffs; only the affected rows are touched.
+   * EventSource reconnects by itself and the new snapshot resyncs us, except
+   * after an error response (e.g. 404 before the station is started).
+   */
+  function startQueueEvents() {
+    const source = new EventSource(`/api/queue/events?station_id=${stationId}`);
+    queueSource = source;
+    const handle = (apply) => (event) => {
+      const msg = JSON.parse(event.data);
+      if (msg.version <= queueVersion && event.type !== "reset") return;  // already applied
+      queueVersion = msg.version;
+      apply(msg);
+    };
+
+    source.addEventListener("reset", handle((msg) => renderQueue(msg.items, msg.currentIndex)));
+    source.addEventListener("insert", handle((msg) => {
+      const container = document.getElementById("queueContainer");
+      const before = queueRows.get(queueOrder[msg.index]) || null;
+      msg.items.forEach((item) => container.insertBefore(createQueueRow(item), before));
+      queueOrder.splice(msg.index, 0, ...msg.items.map((item) => item.id));
+      setCurrentRow(queueCurrent);
+    }));
+    source.addEventListener("update", handle((msg) => {
+      const row = queueRows.get(msg.item.id);
+      if (row) fillQueueRow(row, msg.item);
+    }));
+    source.addEventListener("advance", handle((msg) => setCurrentRow(msg.currentIndex)));
+    source.onerror = () => {
+      if (source.readyState !== EventSource.CLOSED) {
+        console.warn("Queue events dropped, reconnecting...");
+      } else if (queueSource === source) {
+        setTimeout(() => { if (queueSource === source) startQueueEvents(); }, 3000);
+      }
+    };
+  }
+
+  /**
+   * Render the whole queue in #queueContainer (snapshots only)
    */
   function renderQueue(queueData, currentIdx) {
     const container = document.getElementById("queueContainer");
     container.innerHTML = "";
-  
-    queueData.forEach((item, idx) => {
-      const div = document.createElement("div");
-      div.classList.add("queue-item");
-  
-      // highlight the current item
-      if (idx === currentIdx - 1) {
-        div.classList.add("current");
-      }
-  
-      if (item.type === "song") {
-        div.classList.add("song");
-        div.innerHTML = `<strong>Song</strong>: ${item.data.name} by ${item.data.artist}`;
-      } else if (item.type === "conversation") {
-        div.classList.add("conversation");
-        const snippet = item.data.slice(0, 1).join(" / ");
-        div.innerHTML = `<strong>Conversation</strong>: ${snippet}...`;
-      } else if (item.type === "conversation_placeholder") {
-        div.innerHTML = `<em>Conversation Placeholder</em>`;
-      } else {
-        div.innerHTML = `<strong>${item.type}</strong>`;
-      }
-  
-      container.appendChild(div);
-    });
+    queueRows = new Map();
+    queueOrder = queueData.map((item) => item.id);
+    queueData.forEach((item) => container.appendChild(createQueueRow(item)));
+    setCurrentRow(currentIdx);
   }
-  
+
+  function createQueueRow(item) {
+    const div = document.createElement("div");
+    fillQueueRow(div, item);
+    queueRows.set(item.id, div);
+    return div;
+  }
+
+  function fillQueueRow(div, item) {
+    const isCurrent = div.classList.contains("current");
+    div.className = "queue-item";
+    if (isCurrent) div.classList.add("current");
+    const status = item.status === "ready" ? " (ready)" : item.status === "generating" ? " (writing...)" : "";
+
+    if (item.type === "song") {
+      div.classList.add("song");
+      div.innerHTML = `<strong>Song</strong>: ${item.name} by ${item.artist}`;
+    } else if (item.type === "conversation") {
+      div.classList.add("conversation");
+      div.innerHTML = `<strong>Conversation</strong>: ${item.snippet}...${status}`;
+    } else if (item.type === "conversation_placeholder") {
+      const about = item.about ? `: ${item.about}` : "";
+      div.innerHTML = `<em>Conversation Placeholder</em>${about}${status}`;
+    } else {
+      div.innerHTML = `<strong>${item.type}</strong>`;
+    }
+  }
+
+  // highlight the current item (the one before currentIndex)
+  function setCurrentRow(currentIdx) {
+    const previous = queueRows.get(queueOrder[queueCurrent - 1]);
+    if (previous) previous.classList.remove("current");
+    queueCurrent = currentIdx;
+    const row = queueRows.get(queueOrder[currentIdx - 1]);
+    if (row) row.classList.add("current");
+  }
+
   /**
    * Start streaming PCM from the server – no mic usage (CALLER side).
    * We do NOT visualize the caller's audio.
@@ -125,7 +208,8 @@ import {
     // Open WebSocket to server
     const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
     const host = window.location.host;
-    ws = new WebSocket(`${protocol}//${host}/ws/realtime-convo`);
+    ws = new WebSocket(`${protocol}//${host}/ws/realtime-convo?format=binary`);
+    ws.binaryType = "arraybuffer";
   
     ws.onopen = () => {
       logText("WebSocket connected to server (caller).");
@@ -138,6 +222,14 @@ import {
       stopStreamFromServer();
     };
     ws.onmessage = (event) => {
+      // Binary frame: header + raw PCM16, no base64 or JSON to decode
+      if (event.data instanceof ArrayBuffer) {
+        const frame = parseAudioFrame(event.data);
+        if (frame && frame.codec === CODEC_PCM16) {
+          playCallerChunk(frame.audio);
+        }
+        return;
+      }
       let data;
       try {
         data = JSON.parse(event.data);
@@ -183,7 +275,7 @@ import {
         const b64 = data.media.payload;
         const raw = base64ToArrayBuffer(b64);
         // speaker is "caller" – no wave visualization for that
-        playPCMChunk(raw);
+        playCallerChunk(raw);
         break;
       }
       case "text_delta": {
@@ -205,10 +297,18 @@ import {
    * Start a dedicated WebSocket for host (Matt/Mollie) TTS
    * We DO visualize any chunk from 'matt' or 'mollie'
    */
-  function startHostStream() {
+  async function startHostStream() {
     const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
     const host = window.location.host;
-    hostWS = new WebSocket(`${protocol}//${host}/ws/host_audio`);
+
+    // Ask for Opus (~32 kbit/s instead of 384) when the browser can decode it
+    if (hostCodec === null) {
+      hostCodec = (await createOpusDecoder()) ? "&codec=opus" : "";
+    }
+    // After a drop, resume from the last frame we heard (server replays the gap)
+    const since = lastHostSeq === null ? "" : `&since=${lastHostSeq}`;
+    hostWS = new WebSocket(`${protocol}//${host}/ws/host_audio?station_id=${stationId}&format=binary${hostCodec}${since}`);
+    hostWS.binaryType = "arraybuffer";
   
     hostWS.onopen = () => {
       console.log("Host TTS WebSocket connected!");
@@ -217,9 +317,24 @@ import {
       console.error("Host TTS WebSocket error:", e);
     };
     hostWS.onclose = () => {
-      console.log("Host TTS WebSocket closed.");
+      console.log("Host TTS WebSocket closed, reconnecting...");
+      setTimeout(startHostStream, 1000);
     };
     hostWS.onmessage = (event) => {
+      if (event.data instanceof ArrayBuffer) {
+        const frame = parseAudioFrame(event.data);
+        if (frame) lastHostSeq = frame.seq;
+        if (frame && frame.codec === CODEC_PCM16) {
+          // Envelope spans the whole chunk: 24 kHz PCM16 = 48 bytes per ms
+          const envelopeMs = frame.audio.byteLength / 48 / Math.max(1, frame.envelope.length);
+          handleHostAudio(frame.audio, frame.speaker, frame.envelope, envelopeMs, frame.timestamp);
+        } else if (frame && frame.codec === CODEC_OPUS) {
+          handleHostOpus(frame);
+        }
+        return;
+      }
+
+      // JSON fallback (base64 payload)
       let data;
       try {
         data = JSON.parse(event.data);
@@ -230,20 +345,100 @@ import {
   
       // Only handle "event=media" => PCM data
       if (data.event === "media" && data.media?.payload) {
+        if (data.seq !== undefined) lastHostSeq = data.seq;
         const raw = base64ToArrayBuffer(data.media.payload);
         const spk = (data.speaker || "matt").toLowerCase();
-  
-        // 1) Visualize ONLY if speaker is 'matt' or 'mollie'
-        if (spk === "matt" || spk === "mollie") {
-          updateVisualiser(new Uint8Array(raw), spk);
-        }
-  
-        // 2) Always play out loud
-        playPCMChunk(raw);
+        handleHostAudio(raw, spk, data.envelope, data.envelope_ms, data.timestamp);
       }
     };
   }
-  
+
+  /**
+   * Lazily create the playback schedulers once an AudioContext exists.
+   */
+  function ensureSchedulers() {
+    if (!audioContext) return false;
+    if (!hostScheduler) {
+      hostScheduler = new PlaybackScheduler(audioContext);
+      callerScheduler = new PlaybackScheduler(audioContext);
+    }
+    return true;
+  }
+
+  /**
+   * One chunk of host audio: schedule it at its presentation time, and
+   * animate the server's envelope in step with it.
+   */
+  function handleHostAudio(rawPCM, speaker, envelope, envelopeMs, pts) {
+    if (!ensureSchedulers()) return;
+
+    // 1) Play at the exact AudioContext time for this timestamp
+    const buffer = pcm16ToBuffer(rawPCM);
+    const when = (pts === undefined)
+      ? hostScheduler.scheduleNext(buffer)
+      : hostScheduler.scheduleAt(buffer, pts);
+
+    // 2) Visualize ONLY if speaker is 'matt' or 'mollie'
+    //    (server sends a precomputed envelope, so we never scan the samples)
+    if ((speaker === "matt" || speaker === "mollie") && envelope) {
+      updateVisualiser(envelope, envelopeMs, speaker, hostScheduler.toPerformanceTime(when));
+    }
+  }
+
+  /**
+   * Caller audio has no station timestamps; just keep it gapless.
+   */
+  function playCallerChunk(rawPCM) {
+    if (!ensureSchedulers()) return;
+    callerScheduler.scheduleNext(pcm16ToBuffer(rawPCM));
+  }
+
+  /**
+   * Set up a WebCodecs Opus decoder if the browser supports one.
+   */
+  async function createOpusDecoder() {
+    if (typeof AudioDecoder === "undefined") return false;
+    const config = { codec: "opus", sampleRate: 48000, numberOfChannels: 1 };
+    try {
+      const { supported } = await AudioDecoder.isConfigSupported(config);
+      if (!supported) return false;
+      opusDecoder = new AudioDecoder({
+        output: (audioData) => {
+          const samples = new Float32Array(audioData.numberOfFrames);
+          audioData.copyTo(samples, { planeIndex: 0, format: "f32-planar" });
+          // Chunk timestamps carry the presentation time (µs) through the decoder
+          const pts = audioData.timestamp / 1e6;
+          if (ensureSchedulers()) {
+            hostScheduler.scheduleAt(float32ToBuffer(samples, audioData.sampleRate), pts);
+          }
+          audioData.close();
+        },
+        error: (e) => console.error("Opus decoder error:", e),
+      });
+      opusDecoder.configure(config);
+      return true;
+    } catch (err) {
+      console.warn("Opus decoding unavailable, using PCM:", err);
+      return false;
+    }
+  }
+
+  /**
+   * Opus frame: visualise from the envelope, feed each 20 ms packet to the decoder.
+   */
+  function handleHostOpus(frame) {
+    const packets = unpackOpusPackets(frame.audio);
+    const spk = frame.speaker;
+    if ((spk === "matt" || spk === "mollie") && frame.envelope.length && ensureSchedulers()) {
+      const startAt = hostScheduler.toPerformanceTime(hostScheduler.presentationTime(frame.timestamp));
+      updateVisualiser(frame.envelope, (packets.length * 20) / frame.envelope.length, spk, startAt);
+    }
+    packets.forEach((data, i) => {
+      const timestamp = Math.round((frame.timestamp + i * 0.02) * 1e6);
+      opusDecoder.decode(new EncodedAudioChunk({ type: "key", timestamp, data }));
+    });
+  }
+
   /**
    * Convert base64 -> ArrayBuffer
    */
@@ -258,26 +453,26 @@ import {
   }
   
   /**
-   * Play raw PCM16 in the browser by decoding it into an AudioBuffer
+   * Decode raw PCM16 into an AudioBuffer
    */
-  function playPCMChunk(rawPCM) {
-    if (!audioContext) return;
-  
-    const dv = new DataView(rawPCM);
-    const float32Samples = new Float32Array(dv.byteLength / 2);
+  function pcm16ToBuffer(rawPCM) {
+    const int16Samples = new Int16Array(rawPCM, 0, rawPCM.byteLength >> 1);
+    const float32Samples = new Float32Array(int16Samples.length);
   
-    for (let i = 0, idx = 0; i < dv.byteLength; i += 2, idx++) {
-      const int16 = dv.getInt16(i, true);
-      float32Samples[idx] = Math.max(-1, Math.min(1, int16 / 32768));
+    for (let i = 0; i < int16Samples.length; i++) {
+      float32Samples[i] = int16Samples[i] / 32768;
     }
-  
-    const buffer = audioContext.createBuffer(1, float32Samples.length, 24000);
+
+    return float32ToBuffer(float32Samples, 24000);
+  }
+
+  /**
+   * Wrap decoded float samples in an AudioBuffer at the given sample rate
+   */
+  function float32ToBuffer(float32Samples, sampleRate) {
+    const buffer = audioContext.createBuffer(1, float32Samples.length, sampleRate);
     buffer.copyToChannel(float32Samples, 0, 0);
-  
-    const source = audioContext.createBufferSource();
-    source.buffer = buffer;
-    source.connect(audioContext.destination);
-    source.start();
+    return buffer;
   }
   
   /**
@@ -0,0 +1,48 @@
+// frontend/framing.js
+//
+// Binary audio frames (mirrors src/framing.py):
+//   u8 version | u8 codec | u8 speaker | u8 envLen | u32 seq | f64 timestamp
+//   then envLen envelope bytes, then the audio payload: raw PCM16 LE for codec 0,
+//   u16-length-prefixed Opus packets for codec 1.
+
+export const HEADER_SIZE = 16;
+export const FRAME_VERSION = 1;
+export const CODEC_PCM16 = 0;
+export const CODEC_OPUS = 1;
+export const SPEAKERS = ["matt", "mollie", "caller", "default"];
+
+/**
+ * Parse a binary frame (ArrayBuffer) into its fields, or null if unsupported.
+ */
+export function parseAudioFrame(buffer) {
+  const view = new DataView(buffer);
+  if (buffer.byteLength < HEADER_SIZE || view.getUint8(0) !== FRAME_VERSION) {
+    return null;
+  }
+  const envLen = view.getUint8(3);
+  const audioStart = HEADER_SIZE + envLen;
+  return {
+    codec: view.getUint8(1),
+    speaker: SPEAKERS[view.getUint8(2)] || "default",
+    seq: view.getUint32(4, true),
+    timestamp: view.getFloat64(8, true),
+    envelope: new Uint8Array(buffer, HEADER_SIZE, envLen),
+    audio: buffer.slice(audioStart),
+  };
+}
+
+/**
+ * Split a CODEC_OPUS payload into its individual Opus packets.
+ */
+export function unpackOpusPackets(payload) {
+  const view = new DataView(payload);
+  const packets = [];
+  let pos = 0;
+  while (pos + 2 <= payload.byteLength) {
+    const length = view.getUint16(pos, true);
+    pos += 2;
+    packets.push(new Uint8Array(payload, pos, length));
+    pos += length;
+  }
+  return packets;
+}
@@ -0,0 +1,70 @@
+// frontend/scheduler.js
+//
+// Schedules audio buffers at exact AudioContext times so consecutive chunks
+// play back to back, with no gaps, overlaps or drift.
+
+const JITTER_S = 0.15;   // safety margin added when (re)anchoring the timeline
+const MAX_AHEAD_S = 3.0; // re-anchor if the mapping ever runs this far ahead
+
+export class PlaybackScheduler {
+  constructor(audioContext) {
+    this.audioContext = audioContext;
+    this.ptsOffset = null; // AudioContext time = pts + ptsOffset
+    this.nextTime = 0;     // for streams without timestamps
+  }
+
+  /**
+   * Play `buffer` at the time given by its presentation timestamp (seconds on
+   * the server's station clock). Returns the AudioContext start time.
+   */
+  scheduleAt(buffer, pts) {
+    const now = this.audioContext.currentTime;
+    let when = this.ptsOffset === null ? -Infinity : pts + this.ptsOffset;
+    if (when < now || when > now + MAX_AHEAD_S) {
+      // First chunk, a late chunk or clock drift: re-anchor the timeline
+      this.ptsOffset = now + JITTER_S - pts;
+      when = pts + this.ptsOffset;
+    }
+    this.start(buffer, when);
+    return when;
+  }
+
+  /**
+   * Where a timestamp would currently be played (without scheduling anything).
+   */
+  presentationTime(pts) {
+    const now = this.audioContext.currentTime;
+    if (this.ptsOffset === null) return now + JITTER_S;
+    return Math.max(now, pts + this.ptsOffset);
+  }
+
+  /**
+   * Play `buffer` straight after the previously scheduled one (no timestamps).
+   */
+  scheduleNext(buffer) {
+    const now = this.audioContext.currentTime;
+    const when = this.nextTime < now ? now + JITTER_S : this.nextTime;
+    this.start(buffer, when);
+    return when;
+  }
+
+  start(buffer, when) {
+    const source = this.audioContext.createBufferSource();
+    source.buffer = buffer;
+    source.connect(this.audioContext.destination);
+    source.start(when);
+    this.nextTime = when + buffer.duration;
+  }
+
+  /**
+   * Convert an AudioContext time into a performance.now() timestamp (ms).
+   */
+  toPerformanceTime(when) {
+    return performance.now() + (when - this.audioContext.currentTime) * 1000;
+  }
+
+  reset() {
+    this.ptsOffset = null;
+    this.nextTime = 0;
+  }
+}
@@ -25,44 +25,82 @@ export function initVisualiser() {
  */
 export function resetVisualiser() {
   if (!hostCtx) return;
+  envelopeQueue = [];
+  envelopeHead = 0;
+  current = { amplitude: 0, speaker: current.speaker, at: 0 };
   hostCtx.clearRect(0, 0, hostCanvas.width, hostCanvas.height);
   hostCtx.fillStyle = "#FFF";
   hostCtx.fillRect(0, 0, hostCanvas.width, hostCanvas.height);
 }
 
+// Envelope values waiting to be drawn, each with the time (performance.now ms) it applies from
+let envelopeQueue = [];
+let envelopeHead = 0;
+let stepMs = 20;
+let animating = false;
+let current = { amplitude: 0, speaker: "matt", at: 0 };
+
 /**
- * Render a very simple amplitude bar for each raw PCM chunk.
- * This is intentionally simplified. 
- * If you prefer a more advanced wave shape, you can expand this logic.
+ * Queue a chunk's precomputed amplitude envelope (values 0..255, one per
+ * `envelopeMs`) computed by the server, starting at `startAt` so the bar
+ * lines up with when the audio is actually scheduled to play.
+ * The samples themselves are never touched.
  */
-export function updateVisualiser(audioData, speaker) {
+export function updateVisualiser(envelope, envelopeMs, speaker, startAt = performance.now()) {
   if (!hostCtx) return;
 
-  // 1) Compute an average amplitude
-  //    Each pair of bytes = 16-bit sample
-  let total = 0;
-  for (let i = 0; i < audioData.length; i += 2) {
-    // little-endian 16-bit
-    const sample = (audioData[i] | (audioData[i + 1] << 8));
-    total += Math.abs(sample);
+  if (envelopeMs) stepMs = envelopeMs;
+  for (let i = 0; i < envelope.length; i++) {
+    envelopeQueue.push({ amplitude: envelope[i] / 255, speaker, at: startAt + i * stepMs });
+  }
+
+  if (!animating) {
+    animating = true;
+    requestAnimationFrame(drawFrame);
+  }
+}
+
+/**
+ * Animation frame: show the latest envelope value that is due and draw it as
+ * a simple amplitude bar.
+ */
+function drawFrame(now) {
+  while (envelopeHead < envelopeQueue.length && envelopeQueue[envelopeHead].at <= now) {
+    current = envelopeQueue[envelopeHead++];
+  }
+  if (current.at + stepMs < now && envelopeHead >= envelopeQueue.length) {
+    current = { amplitude: 0, speaker: current.speaker, at: now };
+  }
+
+  // Compact the consumed prefix now and again rather than shifting every step
+  if (envelopeHead > 512) {
+    envelopeQueue = envelopeQueue.slice(envelopeHead);
+    envelopeHead = 0;
+  }
+
+  drawBar(current.amplitude, current.speaker);
+
+  if (envelopeHead < envelopeQueue.length || current.amplitude > 0) {
+    requestAnimationFrame(drawFrame);
+  } else {
+    animating = false;
   }
-  const avg = total / (audioData.length / 2);
-  // Normalised amplitude [0..1]
-  const amplitude = avg / 32768;
+}
 
-  // 2) Clear old display
+function drawBar(amplitude, speaker) {
+  // 1) Clear old display
   hostCtx.clearRect(0, 0, hostCanvas.width, hostCanvas.height);
 
-  // 3) Choose color per speaker
+  // 2) Choose color per speaker
   const color = (speaker === "matt") ? "blue" : "red";
 
-  // 4) Draw a filled bar. 
+  // 3) Draw a filled bar.
   //    E.g. bar height goes up to 80% of canvas.
   const barHeight = amplitude * (hostCanvas.height * 0.8);
   const x = 0;
   const y = hostCanvas.height - barHeight;
   const width = hostCanvas.width;
-  
+
   hostCtx.fillStyle = color;
   hostCtx.fillRect(x, y, width, barHeight);
 }
@@ -0,0 +1,129 @@
+# load_test_host_audio.py
+#
+# Holds hundreds of local websocket listeners against one server process that
+# fans out synthetic host-audio frames through the same Broadcaster as main.py.
+#
+#   python load_test_host_audio.py --listeners 500 --seconds 20
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+
+import websockets
+
+from src.framing import unpack_audio_frame
+
+HOST = "127.0.0.1"
+FRAME_MS = 200
+FRAME_BYTES = 24000 * 2 * FRAME_MS // 1000  # 200 ms of 24 kHz mono PCM16
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Load test the /ws/host_audio fan-out.')
+    parser.add_argument('--listeners', type=int, default=300, help='Number of websocket listeners.')
+    parser.add_argument('--seconds', type=int, default=15, help='How long to stream for.')
+    parser.add_argument('--port', type=int, default=8765, help='Port for the test server.')
+    parser.add_argument('--format', choices=['binary', 'json'], default='binary', help='Wire format the listeners ask for.')
+    parser.add_argument('--slow', type=int, default=5, help='Listeners that stop reading (to check they do not stall others).')
+    return parser.parse_args()
+
+
+def run_server(port):
+    """Server process: a minimal app with the same endpoint + a synthetic publisher."""
+    import uvicorn
+    from fastapi import FastAPI, WebSocket
+    from src.broadcaster import Broadcaster
+
+    app = FastAPI()
+    broadcaster = Broadcaster("load_test")
+
+    @app.websocket("/ws/host_audio")
+    async def host_audio_endpoint(websocket: WebSocket):
+        await broadcaster.serve(websocket)
+
+    @app.get("/stats")
+    def stats():
+        return broadcaster.stats()
+
+    async def publisher():
+        pcm = os.urandom(FRAME_BYTES)
+        envelope = bytes(10)
+        while True:
+            # Timestamped with wall-clock time so listeners can measure delivery latency
+            broadcaster.publish_audio(pcm, "matt", envelope, 20, timestamp=time.time())
+            await asyncio.sleep(FRAME_MS / 1000)
+
+    @app.on_event("startup")
+    async def start_publisher():
+        asyncio.create_task(publisher())
+
+    uvicorn.run(app, host=HOST, port=port, log_level="warning", ws_max_size=2 ** 24)
+
+
+async def listener(url, seconds, results, slow=False):
+    frames = 0
+    latencies = []
+    try:
+        async with websockets.connect(url, max_size=2 ** 24, open_timeout=30) as ws:
+            deadline = time.time() + seconds
+            while time.time() < deadline:
+                if slow:
+                    # Never read: the server should drop/evict us, not stall others
+                    await asyncio.sleep(1)
+                    continue
+                try:
+                    msg = await asyncio.wait_for(ws.recv(), timeout=deadline - time.time())
+                except asyncio.TimeoutError:
+                    break
+                if isinstance(msg, bytes):
+                    sent_at = unpack_audio_frame(msg)["timestamp"]
+                else:
+                    sent_at = json.loads(msg)["timestamp"]
+                frames += 1
+                latencies.append(time.time() - sent_at)
+    except Exception as e:
+        results.setdefault("errors", []).append(str(e))
+    if not slow:
+        results.setdefault("frames", []).append(frames)
+        results.setdefault("latencies", []).extend(latencies)
+
+
+async def run_clients(args):
+    url = f"ws://{HOST}:{args.port}/ws/host_audio?format={args.format}"
+    results = {}
+    tasks = [
+        listener(url, args.seconds, results, slow=(i < args.slow))
+        for i in range(args.listeners)
+    ]
+    start = time.time()
+    await asyncio.gather(*tasks)
+    elapsed = time.time() - start
+
+    frames = sorted(results.get("frames", [0]))
+    latencies = sorted(results.get("latencies", [0.0]))
+    expected = args.seconds * 1000 // FRAME_MS
+    print(f"Listeners: {args.listeners} ({args.slow} deliberately slow, {args.format} frames), "
+          f"ran {elapsed:.1f}s")
+    print(f"Frames per listener: min={frames[0]} median={frames[len(frames) // 2]} "
+          f"max={frames[-1]} (expected ~{expected})")
+    print(f"Delivery latency ms: p50={latencies[len(latencies) // 2] * 1000:.1f} "
+          f"p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}")
+    print(f"Connection errors: {len(results.get('errors', []))}")
+
+
+def main():
+    args = parse_arguments()
+    server = multiprocessing.Process(target=run_server, args=(args.port,), daemon=True)
+    server.start()
+    time.sleep(2)  # let uvicorn bind
+    try:
+        asyncio.run(run_clients(args))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,13 @@ import os
 import sys
 import json
 import time
-import queue
-import random
 import asyncio
-import threading
-from threading import Thread
 
 from fastapi.concurrency import asynccontextmanager
 import websockets
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
 from src.spotify_handler import SpotifyHandler
@@ -21,11 +18,17 @@ from src.news_processor import NewsProcessor
 from src.dialogue_generator import DialogueGenerator
 from src.voice_generator import VoiceGenerator
 from src.audio_player import AudioPlayer
+from src.audio_analysis import LoudnessAnalyser
+from src.framing import pack_audio_frame, unpack_audio_frame, FORMAT_BINARY
+from src.station_clock import StationClock
+from src.host_audio import AudioDecodePool
+from src.loop_monitor import LoopLagMonitor
+from src.station import StationServices, StationRegistry, DEFAULT_STATION_ID
+from src.journal import STATION_JOURNAL_DIR
 from src.constants import REALTIME_MOLLIE_PROMPT
 
 # Additional imports for streaming TTS:
 import base64
-import pydub
 import tempfile
 
 load_dotenv()
@@ -34,34 +37,27 @@ load_dotenv()
 # GLOBALS
 ##############################################################################
 
-app = FastAPI()
-
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
-
-PLAYLIST_ID = "0NvNQWJaSUTBTQjhjWbNfL"
-SONGS_PER_BLOCK = 3
-
-radio_queue = []
-current_index = 0
-radio_running = False
-radio_thread = None
-
-used_articles = set()
-played_songs = []
-dummy_mode = False
-
 spotify_handler = None
 news_processor = None
 dialogue_generator = None
 articles_list = []
+dummy_mode = False
 voice_generator = None
 audio_player = None
+loudness_analyser = None
+decode_pool = None
+
+# Watches for anything blocking the event loop (e.g. inline audio decoding)
+loop_monitor = LoopLagMonitor()
 
 # NEW: We'll store the uvicorn event loop here so threads can schedule tasks on it
 UVICORN_LOOP = None
 
-# Keep track of websockets for host TTS
-HOST_WS_CONNECTIONS = set()
+# Monotonic station clock shared by every station's playout timeline
+station_clock = StationClock()
+
+# Every station this process serves; each owns its queue, history and outputs
+stations = None
 
 ##############################################################################
 # INIT & LIFESPAN
@@ -69,18 +65,35 @@ HOST_WS_CONNECTIONS = set()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global UVICORN_LOOP
+    global UVICORN_LOOP, stations
     UVICORN_LOOP = asyncio.get_event_loop()  # This is Uvicorn’s running event loop
     init_services()
+    loop_monitor.start()
+    stations = StationRegistry(StationServices(
+        station_clock, decode_pool, voice_generator, audio_player,
+        spotify_handler, news_processor, dialogue_generator, articles_list, dummy_mode,
+        journal_dir=STATION_JOURNAL_DIR
+    ))
+    # Render/decode the ident in the background so Start Radio is on air within a second
+    warm_start_task = asyncio.create_task(stations.services.prepare_warm_start())
+    # Stations that were on air when the process last exited carry on where they were
+    await stations.restore_all()
+    stations.start_eviction()
     yield
+    warm_start_task.cancel()
     # On shutdown, if needed, do cleanup
+    await stations.close_all()
+    stations.services.lookahead_executor.shutdown(wait=False)
+    loop_monitor.stop()
+    decode_pool.shutdown()
 
 def init_services():
     """
     Initialize Spotify, news, dialogue, TTS, etc.
     """
     global spotify_handler, news_processor, dialogue_generator
-    global articles_list, dummy_mode, voice_generator, audio_player
+    global articles_list, dummy_mode, voice_generator, audio_player, loudness_analyser
+    global decode_pool
 
     print("Running init_services()...")
 
@@ -114,307 +127,86 @@ def init_services():
             news_processor = None
             dialogue_generator = None
 
-    voice_generator = VoiceGenerator()
-    audio_player = AudioPlayer(visualiser=None)  # HEADLESS
+    loudness_analyser = LoudnessAnalyser()
+    # TTS is cached on disk and shared by every station
+    voice_generator = VoiceGenerator(loudness=loudness_analyser, cache_dir=".cache/tts")
+    audio_player = AudioPlayer(visualiser=None, loudness=loudness_analyser)  # HEADLESS
+    decode_pool = AudioDecodePool(loudness=loudness_analyser)
     print("Voice generator + audio player ready (headless).")
 
+# Registered here so the lifespan (services, station registry) runs with the app
+app = FastAPI(lifespan=lifespan)
 
-##############################################################################
-# QUEUE EXPANSION + HELPERS
-##############################################################################
-
-def get_unique_random_song(spotify_handler, played_songs):
-    song = spotify_handler.get_random_playlist_song(PLAYLIST_ID, played_songs)
-    if song is None:
-        print("No more unique songs found in the playlist.")
-        return None
-    played_songs.append(song['uri'])
-    return song
-
-def expand_queue(play_queue, dummy_mode, spotify_handler, news_processor,
-                 dialogue_generator, played_songs, articles_list, used_articles):
-    """3 songs -> conversation placeholder -> 3 songs -> conversation placeholder."""
-    block1 = []
-    for _ in range(3):
-        if not dummy_mode and spotify_handler:
-            s = get_unique_random_song(spotify_handler, played_songs)
-        else:
-            s = None
-        if not s:
-            s = {"name": "Fallback Song", "artist": "Fallback Artist", "uri": None}
-        block1.append(s)
-
-    for s in block1:
-        play_queue.append({"type": "song", "data": s})
-    last_song = block1[-1]
-    play_queue.append({
-        "type": "conversation_placeholder",
-        "data": {
-            "type": "song_description",
-            "song_name": last_song["name"],
-            "artist": last_song["artist"]
-        }
-    })
-
-    block2 = []
-    for _ in range(3):
-        if not dummy_mode and spotify_handler:
-            s = get_unique_random_song(spotify_handler, played_songs)
-        else:
-            s = None
-        if not s:
-            s = {"name": "Fallback Song", "artist": "Fallback Artist", "uri": None}
-        block2.append(s)
-
-    for s in block2:
-        play_queue.append({"type": "song", "data": s})
-
-    if not dummy_mode and articles_list:
-        available = [a for a in articles_list if a['link'] not in used_articles]
-        if available:
-            sel = random.choice(available)
-            used_articles.add(sel['link'])
-            play_queue.append({
-                "type": "conversation_placeholder",
-                "data": {
-                    "type": "news_description",
-                    "article": sel
-                }
-            })
-        else:
-            play_queue.append({
-                "type": "conversation_placeholder",
-                "data": {
-                    "type": "news_description",
-                    "article": {
-                        "title": "No More Real Articles",
-                        "summary": "No more articles left.",
-                        "link": "#",
-                        "full_text": "None left."
-                    }
-                }
-            })
-    else:
-        play_queue.append({
-            "type": "conversation_placeholder",
-            "data": {
-                "type": "news_description",
-                "article": {
-                    "title": "Dummy Article",
-                    "summary": "This is a dummy summary",
-                    "link": "http://example.com/dummy",
-                    "full_text": "This is dummy full text."
-                }
-            }
-        })
+app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
-def build_initial_queue(dummy_mode, spotify_handler, news_processor, played_songs,
-                        articles_list, used_articles):
-    q = []
-    expand_queue(q, dummy_mode, spotify_handler, news_processor, None,
-                 played_songs, articles_list, used_articles)
-    return q
-
-def generate_conversation_from_placeholder(placeholder_data, dialogue_gen):
-    ctype = placeholder_data["type"]
-    if ctype == "song_description":
-        song_name = placeholder_data["song_name"]
-        artist = placeholder_data["artist"]
-        if dialogue_gen:
-            return dialogue_gen.generate_song_dialogue(song_name, artist)
-        else:
-            return [
-                f"MATT: That was '{song_name}' by {artist}. Always a vibe!",
-                "MOLLIE: Definitely. Let’s keep the party going!"
-            ]
-    elif ctype == "news_description":
-        if dialogue_gen:
-            art = placeholder_data["article"]
-            summary = dialogue_gen.summarise_article_for_dialogue(art)
-            return dialogue_gen.generate_dialogue_for_news(summary)
-        else:
-            return [
-                "MATT: Some interesting news out there, apparently!",
-                "MOLLIE: Big stuff happening. Next song soon!"
-            ]
-    else:
-        return ["MATT: Not sure what to talk about.", "MOLLIE: Me neither."]
-
-def pre_generate_next_conversation_if_needed(play_queue, current_index, diag_gen, is_dummy):
-    if current_index < len(play_queue):
-        nxt = play_queue[current_index]
-        if nxt["type"] == "conversation_placeholder":
-            speeches = (
-                generate_conversation_from_placeholder(nxt["data"], diag_gen)
-                if not is_dummy else
-                ["MATT: Placeholder...", "MOLLIE: Placeholder..."]
-            )
-            nxt["data_context"] = nxt["data"]
-            nxt["type"] = "conversation"
-            nxt["data"] = speeches
 
 ##############################################################################
-# HOST AUDIO STREAMING
+# FASTAPI ROUTES
 ##############################################################################
 
-def stream_host_tts(mp3_path: str):
+def get_station(station_id: str):
+    """Look up an existing station; only /api/start_radio creates them."""
+    station = stations.get(station_id) if stations else None
+    if station is None:
+        raise HTTPException(status_code=404, detail=f"No station '{station_id}'")
+    return station
+
+@app.post("/api/start_radio")
+async def start_radio(station_id: str = DEFAULT_STATION_ID, playlist_id: str = None):
     """
-    Generator: yields small raw PCM chunks (~200ms each) from an MP3 file.
+    (Re)start a station and return its handle straight away. The station puts
+    a pre-rendered ident on air at once and fills its queue in the background.
+    Each station id gets its own queue and history; calling this again restarts
+    that station instead of spawning a second loop.
     """
-    segment = pydub.AudioSegment.from_mp3(mp3_path)
-    segment = segment.set_frame_rate(24000).set_channels(1)
+    try:
+        station = await stations.get_or_create(station_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if playlist_id:
+        station.playlist_id = playlist_id
+    await station.start()
+    return {"status": "ok", "message": "Radio starting.", **station.handle()}
+
+@app.post("/api/stop_radio")
+async def stop_radio(station_id: str = DEFAULT_STATION_ID):
+    await get_station(station_id).stop()
+    return {"status": "ok", "station_id": station_id}
 
-    chunk_ms = 200
-    pos = 0
-    while pos < len(segment):
-        chunk = segment[pos : pos + chunk_ms]
-        pos += chunk_ms
-        yield chunk.raw_data
+@app.get("/api/queue")
+def get_queue(station_id: str = DEFAULT_STATION_ID):
+    """One-off snapshot (compact rows, no article bodies); live updates are on /api/queue/events."""
+    station = stations.get(station_id) if stations else None
+    if station is None:
+        return {"version": 0, "queue": [], "currentIndex": 0}
+    # One consistent snapshot, read without locking the station
+    snapshot = station.events.snapshot()
+    return {
+        "version": snapshot["version"],
+        "queue": snapshot["items"],
+        "currentIndex": snapshot["currentIndex"]
+    }
 
-async def broadcast_host_tts(mp3_path: str, speaker: str):
-    """
-    Async: base64-encodes the PCM frames and sends them to all clients on /ws/host_audio.
-    """
-    for raw_pcm in stream_host_tts(mp3_path):
-        b64_pcm = base64.b64encode(raw_pcm).decode("utf-8")
-        packet = {
-            "event": "media",
-            "media": {"payload": b64_pcm},
-            "speaker": speaker.lower()
-        }
-        # Send to every connected WS
-        dead = []
-        for ws in list(HOST_WS_CONNECTIONS):
-            try:
-                await ws.send_json(packet)
-            except:
-                dead.append(ws)
-        for d in dead:
-            HOST_WS_CONNECTIONS.remove(d)
-
-        await asyncio.sleep(0.2)
-
-
-def play_dialogues(speeches, voice_generator, audio_player):
+@app.get("/api/queue/events")
+async def queue_events(station_id: str = DEFAULT_STATION_ID):
     """
-    1) Generate TTS into MP3 files (via voice_generator).
-    2) For each file => 
-       - schedule an async broadcast to push PCM to /ws/host_audio 
-         on the *UVICORN_LOOP*
-       - block & play via PyGame 
+    Server-Sent Events: a "reset" snapshot, then versioned "insert", "update"
+    and "advance" diffs only when the station's queue changes.
     """
-    q = queue.Queue()
-    gen_thread = Thread(target=voice_generator.generate_to_queue, args=(speeches, q))
-    gen_thread.start()
-
-    while True:
-        item = q.get()
-        if item is None:
-            break
-        audio_file, speaker = item
-
-        # The key fix: schedule the streaming on the uvicorn event loop
-        if UVICORN_LOOP:
-            asyncio.run_coroutine_threadsafe(
-                broadcast_host_tts(audio_file, speaker),
-                UVICORN_LOOP
-            )
-
-        # Play locally (blocking)
-        audio_player._play_file(audio_file, speaker)
-
-##############################################################################
-# RADIO LOOP
-##############################################################################
-
-def radio_loop():
-    global radio_running, radio_queue, current_index
-    global dummy_mode, spotify_handler, voice_generator, audio_player
-
-    print("Radio loop started.")
-
-    while radio_running:
-        if current_index >= len(radio_queue):
-            print("[Radio] queue ended or empty, expanding for continuity.")
-            expand_queue(radio_queue, dummy_mode, spotify_handler, news_processor,
-                         dialogue_generator, played_songs, articles_list, used_articles)
-
-        if current_index >= len(radio_queue):
-            print("[Radio] still no items after expansion, stopping.")
-            radio_running = False
-            break
-
-        item = radio_queue[current_index]
-        current_index += 1
-
-        if item["type"] == "song":
-            sdata = item["data"]
-            print(f"[Radio] Now playing: {sdata['name']} by {sdata['artist']}")
-            if sdata.get("uri"):
-                spotify_handler.play_track(sdata["uri"])
-
-            conversation_prepared = False
-            while radio_running:
-                remaining = (spotify_handler.get_remaining_time()
-                             if sdata.get("uri") else None)
-                if remaining is None:
-                    print("[Radio] Song ended or no playback device. Moving on.")
-                    break
-                if remaining < 10000 and not conversation_prepared:
-                    pre_generate_next_conversation_if_needed(radio_queue, current_index,
-                                                             dialogue_generator, dummy_mode)
-                    conversation_prepared = True
-                if remaining < 4000:
-                    break
-                time.sleep(0.5)
-
-        elif item["type"] == "conversation_placeholder":
-            print("[Radio] conversation_placeholder not pre-generated. Doing now.")
-            speeches = generate_conversation_from_placeholder(item["data"], dialogue_generator)
-            item["type"] = "conversation"
-            item["data"] = speeches
-            print("[Radio] Now playing conversation.")
-            play_dialogues(speeches, voice_generator, audio_player)
-
-        elif item["type"] == "conversation":
-            print(f"[Radio] Playing conversation: {item['data']}")
-            play_dialogues(item["data"], voice_generator, audio_player)
-
-        else:
-            print(f"[Radio] Unknown item type: {item['type']}. Skipping.")
-
-    radio_running = False
-    print("Radio loop finished.")
-
-
-##############################################################################
-# FASTAPI ROUTES
-##############################################################################
-
-@app.post("/api/start_radio")
-def start_radio():
-    global radio_queue, current_index, used_articles, played_songs
-    global radio_running, radio_thread
-
-    radio_queue.clear()
-    used_articles.clear()
-    played_songs.clear()
-    current_index = 0
-
-    radio_queue.extend(build_initial_queue(dummy_mode, spotify_handler, news_processor,
-                                          played_songs, articles_list, used_articles))
-    radio_running = True
-
-    radio_thread = threading.Thread(target=radio_loop, daemon=True)
-    radio_thread.start()
-
-    return {"status": "ok", "message": "Radio started. queue built."}
-
-@app.get("/api/queue")
-def get_queue():
+    station = get_station(station_id)
+    return StreamingResponse(
+        station.events.listen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/stats")
+def get_stats():
     return {
-        "queue": radio_queue,
-        "currentIndex": current_index
+        "event_loop_lag": loop_monitor.stats(),
+        "spotify": spotify_handler.sp.stats() if spotify_handler else None,
+        "playlist_cache": spotify_handler.playlists.stats() if spotify_handler else None,
+        "stations": stations.stats() if stations else {}
     }
 
 @app.get("/")
@@ -426,8 +218,39 @@ def index():
 # CALLER REALTIME WS
 ##############################################################################
 
+async def receive_caller_audio(websocket: WebSocket):
+    """
+    Wait for the next message from the caller and return its audio as base64
+    (what OpenAI expects), or None if it wasn't audio. Accepts binary frames
+    as well as the JSON fallback.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        frame = unpack_audio_frame(message["bytes"])
+        return base64.b64encode(frame["audio"]).decode("utf-8")
+    parsed = json.loads(message.get("text") or "{}")
+    if parsed.get("event") == "media" and "media" in parsed:
+        return parsed["media"]["payload"]
+    return None
+
+async def send_caller_audio(websocket: WebSocket, b64audio: str, binary: bool, seq: int):
+    """Send caller audio as a binary frame, or base64 JSON for older clients."""
+    if binary:
+        await websocket.send_bytes(
+            pack_audio_frame(base64.b64decode(b64audio), "caller", seq, time.time())
+        )
+    else:
+        await websocket.send_json({
+            "event": "media",
+            "media": {"payload": b64audio},
+            "speaker": "caller"
+        })
+
 @app.websocket("/ws/realtime-convo")
 async def realtime_convo_endpoint(websocket: WebSocket):
+    """Caller audio. Clients opt into binary frames with ?format=binary."""
     await websocket.accept()
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -438,17 +261,14 @@ async def realtime_convo_endpoint(websocket: WebSocket):
     print("[WebSocket] connection open")
 
 async def handle_local_echo(websocket: WebSocket):
+    binary = websocket.query_params.get("format") == FORMAT_BINARY
+    seq = 0
     try:
         while True:
-            data = await websocket.receive_text()
-            parsed = json.loads(data)
-            if parsed.get("event") == "media" and "media" in parsed:
-                b64audio = parsed["media"]["payload"]
-                await websocket.send_json({
-                    "event": "media",
-                    "media": {"payload": b64audio},
-                    "speaker": "caller"
-                })
+            b64audio = await receive_caller_audio(websocket)
+            if b64audio is not None:
+                await send_caller_audio(websocket, b64audio, binary, seq)
+                seq += 1
     except WebSocketDisconnect:
         print("Local echo: client disconnected.")
     except Exception as e:
@@ -464,6 +284,7 @@ async def handle_openai_realtime(websocket: WebSocket, api_key: str):
     instructions = REALTIME_MOLLIE_PROMPT.format(custom_context="(Server-based conversation)")
     model = "gpt-4o-realtime-preview-2024-10-01"
     endpoint_url = f"wss://api.openai.com/v1/realtime?model={model}"
+    binary = websocket.query_params.get("format") == FORMAT_BINARY
 
     try:
         async with websockets.connect(endpoint_url, headers=openai_headers, ping_interval=30) as openai_ws:
@@ -490,10 +311,8 @@ async def handle_openai_realtime(websocket: WebSocket, api_key: str):
             async def from_client_to_openai():
                 try:
                     while True:
-                        msg = await websocket.receive_text()
-                        msg_data = json.loads(msg)
-                        if msg_data.get("event") == "media":
-                            b64audio = msg_data["media"]["payload"]
+                        b64audio = await receive_caller_audio(websocket)
+                        if b64audio is not None:
                             await openai_ws.send(json.dumps({
                                 "type": "input_audio_buffer.append",
                                 "audio": b64audio
@@ -504,6 +323,7 @@ async def handle_openai_realtime(websocket: WebSocket, api_key: str):
                     print("from_client_to_openai error:", e)
 
             async def from_openai_to_client():
+                seq = 0
                 try:
                     async for msg_str in openai_ws:
                         try:
@@ -512,11 +332,8 @@ async def handle_openai_realtime(websocket: WebSocket, api_key: str):
                             continue
                         if d.get("type") == "response.audio.delta" and "delta" in d:
                             chunk_b64 = d["delta"]
-                            await websocket.send_json({
-                                "event": "media",
-                                "media": {"payload": chunk_b64},
-                                "speaker": "caller"
-                            })
+                            await send_caller_audio(websocket, chunk_b64, binary, seq)
+                            seq += 1
                         elif d.get("type") == "response.text.delta":
                             delta_text = d.get("delta", "")
                             await websocket.send_json({
@@ -545,23 +362,36 @@ async def handle_openai_realtime(websocket: WebSocket, api_key: str):
 ##############################################################################
 
 @app.websocket("/ws/host_audio")
-async def host_audio_endpoint(websocket: WebSocket):
+async def host_audio_endpoint(websocket: WebSocket, station_id: str = DEFAULT_STATION_ID):
     """
-    We'll push PCM data for Matt/Mollie to these connections in broadcast_host_tts().
+    Host PCM for Matt/Mollie is pushed to these connections by the station's
+    playout scheduler. Listeners pick a station with ?station_id=.
     """
-    await websocket.accept()
-    HOST_WS_CONNECTIONS.add(websocket)
     print("[WebSocket] client joined /ws/host_audio for host TTS")
-    try:
-        while True:
-            _ = await websocket.receive_text()  
-            # Not expecting data from client, 
-            # but must read to keep connection alive.
-    except WebSocketDisconnect:
-        pass
-    finally:
-        HOST_WS_CONNECTIONS.remove(websocket)
-        print("[WebSocket] client left /ws/host_audio")
+    station = stations.get(station_id) if stations else None
+    if station is None:
+        await websocket.close(code=1008)  # no such station (yet); the client retries
+        return
+    await station.broadcaster.serve(websocket)
+    print("[WebSocket] client left /ws/host_audio")
+
+
+##############################################################################
+# HTTP STATION STREAM
+##############################################################################
+
+@app.get("/stream")
+async def station_stream(station_id: str = DEFAULT_STATION_ID):
+    """
+    Icecast-style stream of a station for any media player or <audio> tag.
+    Encoded once, fanned out from a shared ring buffer; no keep-alive needed.
+    """
+    http_stream = get_station(station_id).http_stream
+    return StreamingResponse(
+        http_stream.listen(),
+        media_type=http_stream.content_type,
+        headers={"Cache-Control": "no-cache, no-store"}
+    )
 
 
 ##############################################################################
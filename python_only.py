@@ -14,12 +14,18 @@ from src.spotify_handler import SpotifyHandler
 from src.source_selector import SourceSelector
 from src.audio_player import AudioPlayer
 from src.visualiser import Visualiser
+from src.audio_analysis import LoudnessAnalyser
+from src.playback_tracker import PlaybackTracker
+from src.track_selector import ShuffleBag
 
 load_dotenv()
 
 PLAYLIST_ID = "0NvNQWJaSUTBTQjhjWbNfL"
 SONGS_PER_BLOCK = 3
 
+# No-repeat selection over the cached playlist; reshuffles instead of running out
+track_bag = ShuffleBag()
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Run the customised radio station.')
     parser.add_argument('--dummy', action='store_true', help='Run in dummy mode using pre-recorded speeches.')
@@ -50,11 +56,12 @@ def play_pre_recorded_dialogues(files_and_speakers, visualiser, audio_player):
     visualiser.quit_display()
 
 def get_unique_random_song(spotify_handler, played_songs):
-    song = spotify_handler.get_random_playlist_song(PLAYLIST_ID, played_songs)
+    track_bag.refresh(spotify_handler.playlists.tracks(PLAYLIST_ID))
+    song = track_bag.draw()
     if song is None:
-        print("No more unique songs found in the playlist. Exiting.")
+        print("The playlist has no playable tracks. Exiting.")
         sys.exit(1)
-    played_songs.append(song['uri'])
+    played_songs.add(song['uri'])
     return song
 
 def expand_queue(play_queue, dummy_mode, spotify_handler, news_processor, dialogue_generator,
@@ -227,12 +234,14 @@ def main():
     dummy_mode = args.dummy
 
     visualiser = Visualiser()
-    audio_player = AudioPlayer(visualiser=visualiser)
-    voice_generator = VoiceGenerator()
+    loudness_analyser = LoudnessAnalyser()
+    audio_player = AudioPlayer(visualiser=visualiser, loudness=loudness_analyser)
+    voice_generator = VoiceGenerator(loudness=loudness_analyser)
     spotify_handler = SpotifyHandler(username="leo.camacho1738")
+    playback_tracker = PlaybackTracker(spotify_handler)
 
     used_articles = set()  # Keep track of articles we've used
-    played_songs = []      # Keep track of songs we've played
+    played_songs = set()   # Keep track of songs we've played
 
     if dummy_mode:
         # Dummy mode: no article selection, no dialogue generation needed
@@ -309,6 +318,8 @@ def main():
         elif item["type"] == "song":
             song = item["data"]
             spotify_handler.play_track(song['uri'])
+            # Read progress once; the end is then predicted locally with occasional re-syncs
+            playback_tracker.start(song['uri'])
             print_queue_status(play_queue, current_index)
             print(f"\nNow playing: {song['name']} by {song['artist']}")
 
@@ -317,7 +328,7 @@ def main():
             conversation_prepared = False
 
             while True:
-                remaining_time = spotify_handler.get_remaining_time()
+                remaining_time = playback_tracker.remaining_ms()
                 if remaining_time is None:
                     print("Playback stopped unexpectedly.")
                     break
@@ -16,6 +16,7 @@ from src.audio_player import AudioPlayer
 from src.voice_generator import VoiceGenerator
 from src.visualiser import Visualiser
 from src.dialogue_generator import DialogueGenerator
+from src.audio_analysis import LoudnessAnalyser
 
 load_dotenv()  # Make sure OPENAI_API_KEY (and others) are loaded
 
@@ -75,8 +76,8 @@ class InterruptibleAudioPlayer(AudioPlayer):
     Subclass of AudioPlayer that handles the 'call' interrupt with a 
     0.5s overlap between TTS and phone ring, then forcibly stops TTS.
     """
-    def __init__(self, visualiser, call_event, end_event):
-        super().__init__(visualiser=visualiser)
+    def __init__(self, visualiser, call_event, end_event, loudness=None):
+        super().__init__(visualiser=visualiser, loudness=loudness)
         self.call_event = call_event
         self.end_event = end_event
 
@@ -93,6 +94,8 @@ class InterruptibleAudioPlayer(AudioPlayer):
 
         # Load TTS as a pygame Sound
         tts_sound = pygame.mixer.Sound(audio_file)
+        if self.loudness:
+            tts_sound.set_volume(self.loudness.playback_volume(audio_file))
         tts_channel = pygame.mixer.Channel(0)  # TTS on channel 0
 
         # Start playing TTS
@@ -129,6 +132,8 @@ class InterruptibleAudioPlayer(AudioPlayer):
                 if os.path.exists(ring_file):
                     # Load ring audio and play on channel 1
                     ring_sound = pygame.mixer.Sound(ring_file)
+                    if self.loudness:
+                        ring_sound.set_volume(self.loudness.playback_volume(ring_file))
                     ring_channel = pygame.mixer.Channel(1)
                     ring_channel.play(ring_sound)
 
@@ -257,7 +262,8 @@ def main():
     audio_player = InterruptibleAudioPlayer(
         visualiser=visualiser, 
         call_event=call_event,
-        end_event=end_event
+        end_event=end_event,
+        loudness=LoudnessAnalyser()
     )
 
     # Monitor user input in a background thread
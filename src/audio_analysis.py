@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from pydub import AudioSegment
+
+# Loudness normalisation (EBU R128 / ITU-R BS.1770 style)
+TARGET_LOUDNESS_LUFS = -18.0
+MAX_TRUE_PEAK_DB = -1.0
+MAX_GAIN_DB = 12.0
+BLOCK_MS = 400
+BLOCK_STEP_MS = 100
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+
+LOUDNESS_CACHE_PATH = os.path.join(".cache", "loudness.json")
+MAX_CACHE_ENTRIES = 2000
+
+
+def segment_to_array(audio_segment):
+    """
+    Convert a pydub AudioSegment into a float32 array of shape (channels, samples)
+    scaled to [-1, 1].
+    """
+    samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
+    samples /= float(1 << (8 * audio_segment.sample_width - 1))
+    return samples.reshape((-1, audio_segment.channels)).T
+
+
+def rms_envelope(samples, sample_rate, window_ms, hop_ms):
+    """
+    RMS of a mono float array over `window_ms` windows starting every `hop_ms`,
+    computed in one vectorized pass from a cumulative sum of squares.
+    Value k covers samples[k*hop : k*hop + window] (truncated at the end).
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    if samples.size == 0:
+        return np.zeros(0, dtype=np.float32)
+    window = max(1, int(sample_rate * window_ms / 1000))
+    hop = max(1, int(sample_rate * hop_ms / 1000))
+    energy = np.concatenate([[0.0], np.cumsum(samples ** 2)])
+    starts = np.arange(0, samples.size, hop)
+    ends = np.minimum(starts + window, samples.size)
+    return np.sqrt((energy[ends] - energy[starts]) / (ends - starts)).astype(np.float32)
+
+
+def pcm16_envelope(raw_pcm, sample_rate, step_ms):
+    """
+    Compact amplitude envelope for a mono PCM16 chunk: one RMS value per `step_ms`,
+    quantised to 0..255 so it can ride along with each streamed frame.
+    """
+    samples = np.frombuffer(raw_pcm, dtype="<i2").astype(np.float32) / 32768.0
+    envelope = rms_envelope(samples, sample_rate, step_ms, step_ms)
+    return np.clip(np.rint(envelope * 255), 0, 255).astype(np.uint8)
+
+
+def _biquad_response(b, a, z):
+    """Evaluate a biquad's transfer function at the points z = e^{-jw}."""
+    return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+
+def _k_weighting_response(num_samples, sample_rate):
+    """
+    Frequency response of the BS.1770 K-weighting filter (high shelf + RLB high-pass),
+    designed for any sample rate and evaluated on the rfft bins of a signal.
+    """
+    # Stage 1: +4 dB high shelf at ~1.5 kHz
+    A = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / sample_rate
+    alpha = np.sin(w0) / (2 * (1 / np.sqrt(2)))
+    cos_w0 = np.cos(w0)
+    shelf_b = (
+        A * ((A + 1) + (A - 1) * cos_w0 + 2 * np.sqrt(A) * alpha),
+        -2 * A * ((A - 1) + (A + 1) * cos_w0),
+        A * ((A + 1) + (A - 1) * cos_w0 - 2 * np.sqrt(A) * alpha),
+    )
+    shelf_a = (
+        (A + 1) - (A - 1) * cos_w0 + 2 * np.sqrt(A) * alpha,
+        2 * ((A - 1) - (A + 1) * cos_w0),
+        (A + 1) - (A - 1) * cos_w0 - 2 * np.sqrt(A) * alpha,
+    )
+
+    # Stage 2: RLB high-pass at ~38 Hz
+    w0 = 2 * np.pi * 38.0 / sample_rate
+    alpha = np.sin(w0) / (2 * 0.5)
+    cos_w0 = np.cos(w0)
+    hp_b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    hp_a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+
+    z = np.exp(-2j * np.pi * np.fft.rfftfreq(num_samples))
+    return _biquad_response(shelf_b, shelf_a, z) * _biquad_response(hp_b, hp_a, z)
+
+
+def integrated_loudness(samples, sample_rate):
+    """
+    Gated integrated loudness (LUFS) of a (channels, samples) float array.
+    K-weighting is applied in the frequency domain and the 400 ms / 75% overlap
+    block energies come from one cumulative sum, so the whole clip is analysed
+    without any Python-level loop over samples.
+    """
+    samples = np.atleast_2d(samples)
+    num_samples = samples.shape[1]
+    if num_samples == 0:
+        return float("-inf")
+
+    spectrum = np.fft.rfft(samples, axis=1)
+    spectrum *= _k_weighting_response(num_samples, sample_rate)
+    weighted = np.fft.irfft(spectrum, n=num_samples, axis=1)
+
+    block = int(sample_rate * BLOCK_MS / 1000)
+    step = int(sample_rate * BLOCK_STEP_MS / 1000)
+    energy = np.concatenate(
+        [np.zeros((weighted.shape[0], 1)), np.cumsum(weighted ** 2, axis=1)], axis=1
+    )
+    if num_samples < block:
+        block_power = energy[:, -1:] / num_samples
+    else:
+        starts = np.arange(0, num_samples - block + 1, step)
+        block_power = (energy[:, starts + block] - energy[:, starts]) / block
+
+    # Channel weights are 1.0 for mono/stereo, so sum across channels
+    power = block_power.sum(axis=0)
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(power)
+
+    gated = power[block_loudness > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = power[(block_loudness > ABSOLUTE_GATE_LUFS) & (block_loudness > relative_gate)]
+    if gated.size == 0:
+        return float("-inf")
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def sample_peak_db(samples):
+    """Sample peak in dBFS."""
+    peak = float(np.max(np.abs(samples))) if np.size(samples) else 0.0
+    return 20 * np.log10(peak) if peak > 0 else float("-inf")
+
+
+class LoudnessAnalyser:
+    """
+    Computes loudness metadata once per clip and caches it (keyed by file content),
+    so playback and broadcast paths can look up a normalisation gain without decoding.
+    """
+    def __init__(self, cache_path=LOUDNESS_CACHE_PATH, target_lufs=TARGET_LOUDNESS_LUFS):
+        self.cache_path = cache_path
+        self.target_lufs = target_lufs
+        self.lock = threading.Lock()
+        self.metadata = {}
+        self.keys = {}  # (path, size, mtime) -> content hash
+        self._load()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                self.metadata = json.load(f)
+        except Exception as e:
+            print(f"Could not read loudness cache: {e}")
+            self.metadata = {}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.metadata, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _key(self, audio_file):
+        stat = os.stat(audio_file)
+        file_id = (os.path.abspath(audio_file), stat.st_size, stat.st_mtime_ns)
+        key = self.keys.get(file_id)
+        if key is None:
+            with open(audio_file, "rb") as f:
+                key = hashlib.sha1(f.read()).hexdigest()
+            self.keys[file_id] = key
+        return key
+
+    def analyse_file(self, audio_file, audio_segment=None):
+        """
+        Return loudness metadata {"lufs", "peak_db"} for a file, decoding it only
+        on a cache miss. Pass an already-decoded segment to avoid a second decode.
+        """
+        key = self._key(audio_file)
+        with self.lock:
+            cached = self.metadata.get(key)
+        if cached is not None:
+            return cached
+
+        if audio_segment is None:
+            audio_segment = AudioSegment.from_file(audio_file)
+        samples = segment_to_array(audio_segment)
+        result = {
+            "lufs": integrated_loudness(samples, audio_segment.frame_rate),
+            "peak_db": sample_peak_db(samples),
+        }
+
+        with self.lock:
+            self.metadata[key] = result
+            while len(self.metadata) > MAX_CACHE_ENTRIES:
+                self.metadata.pop(next(iter(self.metadata)))
+            try:
+                self._save()
+            except Exception as e:
+                print(f"Could not write loudness cache: {e}")
+        return result
+
+    def gain_db(self, audio_file, audio_segment=None):
+        """Gain (dB) that brings the clip to the target loudness without clipping."""
+        meta = self.analyse_file(audio_file, audio_segment)
+        if meta["lufs"] == float("-inf"):
+            return 0.0
+        gain = self.target_lufs - meta["lufs"]
+        gain = min(gain, MAX_TRUE_PEAK_DB - meta["peak_db"], MAX_GAIN_DB)
+        return max(gain, -MAX_GAIN_DB)
+
+    def playback_volume(self, audio_file):
+        """Linear volume for pygame (which can only attenuate, so capped at 1.0)."""
+        return min(1.0, 10 ** (self.gain_db(audio_file) / 20))
@@ -3,9 +3,10 @@ import time
 import os
 
 class AudioPlayer:
-    def __init__(self, visualiser=None):
+    def __init__(self, visualiser=None, loudness=None):
         pygame.mixer.init()
         self.visualiser = visualiser
+        self.loudness = loudness  # optional LoudnessAnalyser for per-clip gain
         self.is_playing = False
 
     def play_from_queue(self, audio_queue):
@@ -28,8 +29,16 @@ class AudioPlayer:
         if self.visualiser:
             self.visualiser.quit_display()
 
+    def stop(self):
+        """Cut the current clip short; safe from another thread (_play_file then returns)."""
+        if self.is_playing:
+            pygame.mixer.music.stop()
+
     def _play_file(self, audio_file, speaker):
         pygame.mixer.music.load(audio_file)
+        if self.loudness:
+            # Cached analysis, so this is a lookup rather than another decode
+            pygame.mixer.music.set_volume(self.loudness.playback_volume(audio_file))
         pygame.mixer.music.play()
         self.is_playing = True
 
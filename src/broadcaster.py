@@ -0,0 +1,216 @@
+import time
+import asyncio
+from fastapi import WebSocket, WebSocketDisconnect
+from .framing import AudioFrame, FORMAT_JSON, FORMAT_BINARY, CODEC_PCM16, CODEC_OPUS
+from .opus_codec import OpusEncoder, OPUS_AVAILABLE, pack_opus_packets
+
+SUBSCRIBER_QUEUE_SIZE = 25  # ~5 s of 200 ms frames
+MAX_DROPPED_FRAMES = 50     # disconnect listeners that drop this many frames in a row
+REPLAY_FRAMES = 25          # recent frames kept for late joiners and resumes
+LATE_JOIN_SECONDS = 2.0     # how far back a brand new listener is primed
+
+
+class FrameRing:
+    """
+    Fixed-size, preallocated ring of the most recent published frames, indexed
+    by sequence number. Frames keep their cached encodings, so priming a
+    listener never re-decodes or re-serialises anything.
+    """
+    def __init__(self, capacity=REPLAY_FRAMES):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.next_seq = 0
+
+    def append(self, frame: AudioFrame):
+        self.slots[frame.seq % self.capacity] = frame
+        self.next_seq = frame.seq + 1
+
+    def can_resume(self, seq):
+        """True if `seq` came from this ring (not e.g. from before a server restart)."""
+        return seq is not None and seq < self.next_seq
+
+    def since(self, seq=None):
+        """Buffered frames after `seq` (all buffered frames if seq is None)."""
+        oldest = max(0, self.next_seq - self.capacity)
+        start = oldest if seq is None else max(oldest, seq + 1)
+        return [self.slots[s % self.capacity] for s in range(start, self.next_seq)]
+
+
+class Subscriber:
+    """One listener: a bounded frame queue drained by its own sender task."""
+    def __init__(self, websocket: WebSocket, queue_size: int, wire_format: str = FORMAT_JSON,
+                 codec: int = CODEC_PCM16):
+        self.websocket = websocket
+        self.wire_format = wire_format
+        self.codec = codec
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0        # over the connection's lifetime
+        self.behind = 0         # consecutive drops; reset whenever a frame fits
+        self.sent = 0
+        self.task = None
+
+
+class Broadcaster:
+    """
+    Encode-once fan-out for websocket listeners.
+    publish() serialises a frame at most once per wire format (binary or the JSON
+    fallback) and offers it to every subscriber's bounded queue without awaiting;
+    each subscriber has its own sender task, so a slow listener only ever delays itself. When a listener's queue is full the
+    oldest frame is dropped, and a listener that keeps dropping frames with no
+    room freeing up in between is disconnected.
+    Opus listeners share one encoder, so compression also happens once per frame.
+    Recent frames are kept in a FrameRing: new listeners are primed with the
+    last couple of seconds and reconnecting ones resume from their last sequence
+    number. Must be used from the event loop thread.
+    """
+    def __init__(self, name="broadcast", queue_size=SUBSCRIBER_QUEUE_SIZE,
+                 max_dropped=MAX_DROPPED_FRAMES, sample_rate=24000, clock=None):
+        self.name = name
+        self.clock = clock  # StationClock for late-join priming (frame timestamps are on it)
+        self.ring = FrameRing(min(REPLAY_FRAMES, queue_size))
+        self.sample_rate = sample_rate
+        self.opus_encoder = None
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self.subscribers = set()
+        self.frames_published = 0
+        self.frames_dropped = 0  # includes listeners that have since left
+        self.listeners_evicted = 0
+
+    def subscribe(self, websocket: WebSocket, wire_format: str = FORMAT_JSON,
+                  codec: int = CODEC_PCM16, since=None) -> Subscriber:
+        if codec == CODEC_OPUS and self.opus_encoder is None:
+            self.opus_encoder = OpusEncoder(self.sample_rate)
+        subscriber = Subscriber(websocket, self.queue_size, wire_format, codec)
+        self._prime(subscriber, since)
+        subscriber.task = asyncio.create_task(self._sender(subscriber))
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def _prime(self, subscriber: Subscriber, since):
+        """Queue buffered frames: everything after `since` on resume, else the last few seconds."""
+        if self.ring.can_resume(since):
+            frames = self.ring.since(since)
+        else:
+            frames = self.ring.since()
+            if self.clock is not None:
+                cutoff = self.clock.now() - LATE_JOIN_SECONDS
+                frames = [f for f in frames if f.timestamp >= cutoff]
+        for frame in frames:
+            if subscriber.codec == CODEC_OPUS and frame.opus is None:
+                # Published before any Opus listener existed; PCM is still better than a gap
+                payload = frame.encode(subscriber.wire_format)
+            else:
+                payload = frame.encode(subscriber.wire_format, subscriber.codec)
+            subscriber.queue.put_nowait(payload)
+
+    async def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        if subscriber.task and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+            try:
+                await subscriber.task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def publish_audio(self, audio: bytes, speaker: str, envelope: bytes = b"",
+                      envelope_ms=None, timestamp=None) -> AudioFrame:
+        """Wrap PCM in a sequenced AudioFrame and publish it."""
+        frame = AudioFrame(audio, speaker, self.frames_published,
+                           time.time() if timestamp is None else timestamp,
+                           envelope, envelope_ms)
+        self.publish(frame)
+        return frame
+
+    def publish(self, frame: AudioFrame):
+        """Serialise once per wire format and enqueue for every subscriber (never blocks)."""
+        self.frames_published += 1
+        if any(s.codec == CODEC_OPUS for s in self.subscribers):
+            frame.opus = pack_opus_packets(self.opus_encoder.encode(frame.audio))
+        self.ring.append(frame)
+        for subscriber in list(self.subscribers):
+            self._offer(subscriber, frame.encode(subscriber.wire_format, subscriber.codec))
+
+    def _offer(self, subscriber: Subscriber, payload):
+        try:
+            subscriber.queue.put_nowait(payload)
+            subscriber.behind = 0  # it caught up, so earlier stalls don't count against it
+            return
+        except asyncio.QueueFull:
+            pass
+
+        # Listener is behind: drop its oldest frame to make room
+        try:
+            subscriber.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        subscriber.queue.put_nowait(payload)
+        subscriber.dropped += 1
+        subscriber.behind += 1
+        self.frames_dropped += 1
+
+        if subscriber.behind > self.max_dropped:
+            print(f"[{self.name}] listener fell too far behind, disconnecting.")
+            self.listeners_evicted += 1
+            self.subscribers.discard(subscriber)
+            subscriber.task.cancel()
+            asyncio.create_task(self._close(subscriber.websocket))
+
+    async def _sender(self, subscriber: Subscriber):
+        try:
+            while True:
+                payload = await subscriber.queue.get()
+                if isinstance(payload, bytes):
+                    await subscriber.websocket.send_bytes(payload)
+                else:
+                    await subscriber.websocket.send_text(payload)
+                subscriber.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket died; the endpoint's receive loop will clean up
+            self.subscribers.discard(subscriber)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def serve(self, websocket: WebSocket):
+        """
+        Endpoint body: accept, subscribe and hold the connection open until the
+        client leaves. Clients pick binary frames with ?format=binary (JSON is the
+        default) and Opus with &codec=opus (binary only, when PyAV is available).
+        Reconnecting clients pass &since=<last seq> to resume without a gap.
+        They don't send anything meaningful, but we must read to notice the disconnect.
+        """
+        await websocket.accept()
+        wire_format = websocket.query_params.get("format", FORMAT_JSON)
+        if wire_format != FORMAT_BINARY:
+            wire_format = FORMAT_JSON
+        codec = CODEC_PCM16
+        if (websocket.query_params.get("codec") == "opus" and wire_format == FORMAT_BINARY
+                and OPUS_AVAILABLE):
+            codec = CODEC_OPUS
+        since = websocket.query_params.get("since")
+        since = int(since) if since and since.isdigit() else None
+        subscriber = self.subscribe(websocket, wire_format, codec, since)
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            await self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "listeners": len(self.subscribers),
+            "opus_listeners": sum(1 for s in self.subscribers if s.codec == CODEC_OPUS),
+            "frames_published": self.frames_published,
+            "listeners_evicted": self.listeners_evicted,
+            "frames_dropped": self.frames_dropped,
+        }
@@ -76,6 +76,13 @@ SONG_DIALOGUE_PROMPT = f"""
 """
 
 # Audio Settings
+# Station ident put on air the moment a station starts, while its queue fills
+WARM_START_LINES = [
+    "You're listening to Radio 4U. I'm Matt.",
+    "And I'm Mollie. Your first song is on its way!"
+]
+WARM_START_FALLBACK = "speeches/speech_1_matt.mp3"  # used if the ident can't be synthesised
+
 SAMPLE_RATE = 24000  # Hz
 INTER_SPEECH_GAP = 0.3  # seconds
 
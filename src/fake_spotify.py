@@ -0,0 +1,229 @@
+# Local stand-in for the parts of the Spotify Web API that SpotifyHandler uses,
+# so the station's queue building and benchmarks can run without an account or device.
+#
+#   python -m src.fake_spotify --tracks 5000 --latency-ms 80 --speed 10
+#   SPOTIFY_API_PREFIX=http://127.0.0.1:8901/v1/ python main.py
+
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+
+from fastapi import FastAPI, Request, Response
+
+DEFAULT_PORT = 8901
+DEFAULT_TRACKS = 1000
+DEFAULT_PAGE_SIZE = 100  # Spotify's maximum for playlist tracks
+NUM_ARTISTS = 150
+
+
+class FakeSpotifyState:
+    """
+    Synthetic playlists plus one simulated player. `speed` shortens every track
+    (duration_ms is divided by it) while progress_ms stays in real milliseconds,
+    so both agree with wall-clock time for PlaybackTracker and for stations
+    that time songs from duration_ms alone.
+    """
+    def __init__(self, num_tracks=DEFAULT_TRACKS, latency_ms=0.0, jitter_ms=0.0,
+                 page_size=DEFAULT_PAGE_SIZE, speed=1.0, seed=0):
+        rng = random.Random(seed)
+        # Each artist has a sound; their tracks scatter around it, so similarity means something
+        artist_styles = [
+            (rng.uniform(70, 180), rng.random(), rng.random(), rng.random(), rng.random(),
+             rng.uniform(-20, -3))
+            for _ in range(NUM_ARTISTS)
+        ]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.page_size = page_size
+        self.speed = speed  # >1 makes tracks proportionally shorter
+        self.tracks = []
+        self.features = {}
+        for i in range(num_tracks):
+            track_id = hashlib.sha1(f"{seed}:{i}".encode()).hexdigest()[:22]
+            artist = rng.randrange(NUM_ARTISTS)
+            self.tracks.append({
+                "id": track_id,
+                "uri": f"spotify:track:{track_id}",
+                "type": "track",
+                "name": f"Track {i}",
+                "duration_ms": int(rng.randint(120_000, 300_000) / speed),
+                "artists": [{"name": f"Artist {artist}"}],
+            })
+            tempo, energy, danceability, valence, acousticness, loudness = artist_styles[artist]
+            self.features[track_id] = {
+                "id": track_id,
+                "tempo": round(tempo + rng.gauss(0, 8), 3),
+                "energy": min(1.0, max(0.0, energy + rng.gauss(0, 0.1))),
+                "danceability": min(1.0, max(0.0, danceability + rng.gauss(0, 0.1))),
+                "valence": min(1.0, max(0.0, valence + rng.gauss(0, 0.1))),
+                "acousticness": min(1.0, max(0.0, acousticness + rng.gauss(0, 0.1))),
+                "loudness": round(loudness + rng.gauss(0, 1.5), 3),
+            }
+        self.by_uri = {track["uri"]: track for track in self.tracks}
+        self.snapshot_version = 1
+        self.requests = 0
+
+        self.current = None     # track dict
+        self.started_at = 0.0   # monotonic time the track (notionally) started at
+        self.paused_progress = None
+        self.volume = 100
+
+    def snapshot_id(self):
+        return f"fake-snapshot-{self.snapshot_version}"
+
+    def progress_ms(self):
+        if self.paused_progress is not None:
+            return self.paused_progress
+        return int((time.monotonic() - self.started_at) * 1000)
+
+    def playback(self):
+        if self.current is None:
+            return None
+        progress = self.progress_ms()
+        if progress >= self.current["duration_ms"]:
+            self.current = None  # played out; a single-uri context simply stops
+            return None
+        return {
+            "is_playing": self.paused_progress is None,
+            "progress_ms": progress,
+            "item": self.current,
+            "device": {"id": "fake-device", "name": "Fake Spotify", "volume_percent": self.volume},
+        }
+
+
+def create_app(state: FakeSpotifyState) -> FastAPI:
+    app = FastAPI()
+    app.state.fake = state
+
+    @app.middleware("http")
+    async def simulated_latency(request: Request, call_next):
+        state.requests += 1
+        delay = state.latency_ms + random.uniform(0, state.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        return await call_next(request)
+
+    @app.get("/v1/playlists/{playlist_id}")
+    def playlist(playlist_id: str):
+        return {
+            "id": playlist_id,
+            "name": f"Fake playlist {playlist_id}",
+            "snapshot_id": state.snapshot_id(),
+            "tracks": {"total": len(state.tracks)},
+        }
+
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    def playlist_tracks(request: Request, playlist_id: str, offset: int = 0, limit: int = None):
+        limit = min(limit or state.page_size, state.page_size)
+        page = state.tracks[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(state.tracks):
+            next_url = str(request.url.include_query_params(offset=offset + limit, limit=limit))
+        return {
+            "items": [{"track": track} for track in page],
+            "offset": offset,
+            "limit": limit,
+            "total": len(state.tracks),
+            "next": next_url,
+        }
+
+    @app.get("/v1/me/player")
+    def current_playback():
+        playback = state.playback()
+        if playback is None:
+            return Response(status_code=204)
+        return playback
+
+    @app.put("/v1/me/player/play")
+    async def start_playback(request: Request):
+        body = await request.json() if await request.body() else {}
+        uris = body.get("uris") or []
+        if uris:
+            track = state.by_uri.get(uris[0])
+            if track is None:
+                return Response(status_code=404)
+            state.current = track
+            state.started_at = time.monotonic()
+        elif state.current is not None and state.paused_progress is not None:
+            state.started_at = time.monotonic() - state.paused_progress / 1000
+        state.paused_progress = None
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/pause")
+    def pause_playback():
+        if state.current is not None:
+            state.paused_progress = state.progress_ms()
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/seek")
+    def seek(position_ms: int):
+        if state.current is not None:
+            state.started_at = time.monotonic() - position_ms / 1000
+            if state.paused_progress is not None:
+                state.paused_progress = position_ms
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/volume")
+    def volume(volume_percent: int):
+        state.volume = max(0, min(100, volume_percent))
+        return Response(status_code=204)
+
+    @app.get("/v1/search")
+    def search(q: str, type: str = "track", limit: int = 10, offset: int = 0):
+        if type == "playlist":
+            return {"playlists": {"items": [{"id": "fake", "name": q, "uri": "spotify:playlist:fake"}]}}
+        text, _, artist = q.partition("artist:")
+        text, artist = text.strip().lower(), artist.strip().lower()
+        matches = [
+            track for track in state.tracks
+            if text in track["name"].lower()
+            and (not artist or artist in track["artists"][0]["name"].lower())
+        ]
+        return {"tracks": {"items": matches[offset:offset + limit], "total": len(matches)}}
+
+    # spotipy requests "audio-features/?ids=..."; serve both spellings to avoid a redirect
+    @app.get("/v1/audio-features")
+    @app.get("/v1/audio-features/")
+    def audio_features(ids: str):
+        return {"audio_features": [state.features.get(track_id) for track_id in ids.split(",")]}
+
+    @app.post("/fake/playlist/edit")
+    def edit_playlist():
+        """Bump the snapshot_id, as an edit in the Spotify app would."""
+        state.snapshot_version += 1
+        return {"snapshot_id": state.snapshot_id()}
+
+    @app.get("/fake/stats")
+    def stats():
+        return {"requests": state.requests, "snapshot_id": state.snapshot_id(),
+                "playing": state.current["uri"] if state.current else None}
+
+    return app
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run a local fake of the Spotify Web API.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on.')
+    parser.add_argument('--tracks', type=int, default=DEFAULT_TRACKS, help='Tracks in every playlist.')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='Playlist tracks per page.')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added latency per request.')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Extra random latency per request.')
+    parser.add_argument('--speed', type=float, default=1.0, help='Track speed-up (e.g. 10 = every track is 10x shorter).')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic playlist.')
+    return parser.parse_args()
+
+
+def main():
+    import uvicorn
+    args = parse_arguments()
+    state = FakeSpotifyState(args.tracks, args.latency_ms, args.jitter_ms, args.page_size,
+                             args.speed, args.seed)
+    print(f"Fake Spotify on http://127.0.0.1:{args.port}/v1/ "
+          f"({args.tracks} tracks, {args.latency_ms:.0f} ms latency, x{args.speed} playback)")
+    uvicorn.run(create_app(state), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
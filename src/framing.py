@@ -0,0 +1,99 @@
+import json
+import struct
+import base64
+
+# Binary audio frame: fixed little-endian header, then the envelope bytes, then audio.
+#   version  u8   FRAME_VERSION
+#   codec    u8   CODEC_PCM16 (raw PCM16 LE mono) or CODEC_OPUS (length-prefixed packets)
+#   speaker  u8   index into SPEAKERS
+#   env_len  u8   number of envelope bytes that follow the header
+#   seq      u32  frame sequence number
+#   ts       f64  timestamp in seconds
+HEADER = struct.Struct("<BBBBId")
+FRAME_VERSION = 1
+
+CODEC_PCM16 = 0
+CODEC_OPUS = 1
+
+SPEAKERS = ["matt", "mollie", "caller", "default"]
+SPEAKER_IDS = {name: i for i, name in enumerate(SPEAKERS)}
+
+
+def pack_audio_frame(audio: bytes, speaker: str, seq: int, timestamp: float,
+                     envelope: bytes = b"", codec: int = CODEC_PCM16) -> bytes:
+    """Build a binary frame: header + envelope + audio payload."""
+    speaker_id = SPEAKER_IDS.get(speaker, SPEAKER_IDS["default"])
+    header = HEADER.pack(FRAME_VERSION, codec, speaker_id, len(envelope),
+                         seq & 0xFFFFFFFF, timestamp)
+    return b"".join((header, envelope, audio))
+
+
+def unpack_audio_frame(frame: bytes) -> dict:
+    """Inverse of pack_audio_frame."""
+    version, codec, speaker_id, env_len, seq, timestamp = HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    start = HEADER.size
+    return {
+        "codec": codec,
+        "speaker": SPEAKERS[speaker_id] if speaker_id < len(SPEAKERS) else "default",
+        "seq": seq,
+        "timestamp": timestamp,
+        "envelope": frame[start:start + env_len],
+        "audio": frame[start + env_len:],
+    }
+
+
+def json_audio_frame(audio: bytes, speaker: str, seq: int, timestamp: float,
+                     envelope=None, envelope_ms=None) -> dict:
+    """The legacy JSON/base64 packet, kept as a fallback for older clients."""
+    packet = {
+        "event": "media",
+        "media": {"payload": base64.b64encode(audio).decode("utf-8")},
+        "speaker": speaker,
+        "seq": seq,
+        "timestamp": timestamp,
+    }
+    if envelope is not None:
+        packet["envelope"] = list(envelope)
+        packet["envelope_ms"] = envelope_ms
+    return packet
+
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+
+
+class AudioFrame:
+    """
+    One published audio frame. Each wire format / codec pair is serialised at
+    most once, however many listeners receive it.
+    """
+    def __init__(self, audio: bytes, speaker: str, seq: int, timestamp: float,
+                 envelope: bytes = b"", envelope_ms=None):
+        self.audio = audio
+        self.opus = None  # packed Opus packets, set by the broadcaster when needed
+        self.speaker = speaker
+        self.seq = seq
+        self.timestamp = timestamp
+        self.envelope = envelope
+        self.envelope_ms = envelope_ms
+        self._encoded = {}
+
+    def encode(self, wire_format: str, codec: int = CODEC_PCM16):
+        key = (wire_format, codec)
+        data = self._encoded.get(key)
+        if data is None:
+            if wire_format == FORMAT_BINARY and codec == CODEC_OPUS and self.opus is not None:
+                data = pack_audio_frame(self.opus, self.speaker, self.seq, self.timestamp,
+                                        self.envelope, codec=CODEC_OPUS)
+            elif wire_format == FORMAT_BINARY:
+                data = pack_audio_frame(self.audio, self.speaker, self.seq, self.timestamp,
+                                        self.envelope)
+            else:
+                data = json.dumps(json_audio_frame(
+                    self.audio, self.speaker, self.seq, self.timestamp,
+                    self.envelope if self.envelope_ms else None, self.envelope_ms
+                ))
+            self._encoded[key] = data
+        return data
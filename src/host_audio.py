@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pydub import AudioSegment
+from .audio_analysis import pcm16_envelope
+
+HOST_SAMPLE_RATE = 24000
+HOST_CHUNK_MS = 200
+ENVELOPE_STEP_MS = 20
+
+
+def decode_clip(audio_file, gain_db=None, loudness=None):
+    """
+    Decode an audio file into ready-to-send host frames: a list of
+    (pcm16 bytes, envelope bytes), ~HOST_CHUNK_MS each, mono at HOST_SAMPLE_RATE.
+    Blocking and CPU-heavy, so it belongs in an executor, never on the event loop.
+    Args:
+        gain_db: normalisation gain to apply, if already known.
+        loudness: or a LoudnessAnalyser to look it up (reusing this decode on a miss).
+    """
+    segment = AudioSegment.from_file(audio_file)
+    if gain_db is None and loudness is not None:
+        gain_db = loudness.gain_db(audio_file, segment)
+    if gain_db:
+        segment = segment.apply_gain(gain_db)
+    segment = segment.set_frame_rate(HOST_SAMPLE_RATE).set_channels(1).set_sample_width(2)
+
+    raw = segment.raw_data
+    chunk_bytes = HOST_SAMPLE_RATE * 2 * HOST_CHUNK_MS // 1000
+    frames = []
+    for pos in range(0, len(raw), chunk_bytes):
+        pcm = raw[pos:pos + chunk_bytes]
+        frames.append((pcm, pcm16_envelope(pcm, HOST_SAMPLE_RATE, ENVELOPE_STEP_MS).tobytes()))
+    return frames
+
+
+class AudioDecodePool:
+    """
+    Runs clip decoding/resampling off the event loop in a thread pool (pydub
+    shells out to ffmpeg, so threads overlap well).
+    """
+    def __init__(self, threads=2, loudness=None):
+        self.loudness = loudness
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="decode")
+
+    async def decode(self, audio_file):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.threads, decode_clip, audio_file, None, self.loudness)
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False)
@@ -0,0 +1,198 @@
+import struct
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .station_clock import StationClock, FramePacer
+from .host_audio import HOST_SAMPLE_RATE, HOST_CHUNK_MS
+
+# PyAV ships with aiortc; without it the stream falls back to WAV
+try:
+    import av
+except ImportError:
+    av = None
+
+STREAM_BITRATE = 64000
+STREAM_BUFFER_SECONDS = 10
+MAX_CHUNK_OFFSETS = 256
+
+
+class Mp3Encoder:
+    """Continuous MP3 encoder: an elementary MP3 stream is playable as-is by any player."""
+    content_type = "audio/mpeg"
+
+    def __init__(self, sample_rate=HOST_SAMPLE_RATE, bitrate=STREAM_BITRATE):
+        self.sample_rate = sample_rate
+        self.codec = av.CodecContext.create("libmp3lame", "w")
+        self.codec.sample_rate = sample_rate
+        self.codec.layout = "mono"
+        self.codec.format = "s16p"
+        self.codec.bit_rate = bitrate
+        self.codec.open()
+        self.frame_size = self.codec.frame_size or 576
+        self.pending = np.zeros(0, dtype="<i2")
+        self.pts = 0
+
+    def header(self):
+        return b""
+
+    def encode(self, pcm: bytes) -> bytes:
+        samples = np.concatenate([self.pending, np.frombuffer(pcm, dtype="<i2")])
+        usable = len(samples) - len(samples) % self.frame_size
+        self.pending = samples[usable:]
+
+        out = []
+        for start in range(0, usable, self.frame_size):
+            chunk = samples[start:start + self.frame_size].reshape(1, -1)
+            frame = av.AudioFrame.from_ndarray(chunk, format="s16p", layout="mono")
+            frame.sample_rate = self.sample_rate
+            frame.pts = self.pts
+            self.pts += self.frame_size
+            out.extend(bytes(packet) for packet in self.codec.encode(frame))
+        return b"".join(out)
+
+
+class WavEncoder:
+    """Fallback: PCM16 behind a WAV header with 'unknown' (maximum) sizes."""
+    content_type = "audio/wav"
+
+    def __init__(self, sample_rate=HOST_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+
+    def header(self):
+        byte_rate = self.sample_rate * 2
+        return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+                + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, self.sample_rate, byte_rate, 2, 16)
+                + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+    def encode(self, pcm: bytes) -> bytes:
+        return pcm
+
+
+class HttpStationStream:
+    """
+    One continuously encoded station stream for passive HTTP listeners.
+    run() ticks on the station clock, takes the host audio that is due (or
+    silence), encodes it exactly once in a worker thread and appends it to a
+    preallocated ring buffer. Each listener only keeps a read cursor into that
+    buffer, so adding listeners costs a memory copy per chunk and no encoding.
+    The encoder only runs while someone is listening: the first listener starts
+    it and the last one to leave stops it.
+    """
+    def __init__(self, clock: StationClock, sample_rate=HOST_SAMPLE_RATE,
+                 buffer_seconds=STREAM_BUFFER_SECONDS):
+        self.clock = clock
+        self.sample_rate = sample_rate
+        self.encoder = Mp3Encoder(sample_rate) if av is not None else WavEncoder(sample_rate)
+        self.content_type = self.encoder.content_type
+
+        self.frame_seconds = HOST_CHUNK_MS / 1000
+        self.frame_bytes = int(sample_rate * self.frame_seconds) * 2
+        self.silence = bytes(self.frame_bytes)
+
+        # Generous for MP3 and enough for raw PCM at the fallback rate
+        self.capacity = sample_rate * 2 * buffer_seconds
+        self.ring = bytearray(self.capacity)
+        self.written = 0                   # absolute byte offset of the write head
+        self.chunk_offsets = deque(maxlen=MAX_CHUNK_OFFSETS)  # where each encoded chunk starts
+        self.pending = deque()             # (pts, pcm) waiting to be aired
+        self.condition = asyncio.Condition()
+        self.listeners = 0
+        self.task = None
+        # One thread, so an encode left running by a stop() never overlaps the next start's
+        self.encode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-encode")
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.chunk_offsets.clear()  # nothing encoded before a pause is worth joining at
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        self.pending.clear()
+
+    def close(self):
+        self.stop()
+        self.encode_executor.shutdown(wait=False)
+
+    def push(self, pcm: bytes, pts: float):
+        """Queue host audio with its presentation timestamp (event loop thread)."""
+        if self.task is None:
+            return  # nobody listening, nothing to encode
+        if len(pcm) < self.frame_bytes:
+            pcm = pcm + bytes(self.frame_bytes - len(pcm))
+        self.pending.append((pts, pcm))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        pacer = FramePacer(self.clock, lead=0)
+        while True:
+            tick = await pacer.wait()
+
+            # Frames whose time has passed without airing are dropped, not delayed
+            while self.pending and self.pending[0][0] < tick - self.frame_seconds / 2:
+                self.pending.popleft()
+            if self.pending and self.pending[0][0] <= tick + self.frame_seconds / 2:
+                pcm = self.pending.popleft()[1]
+            else:
+                pcm = self.silence
+
+            # Off the loop: MP3 encoding 5x a second per station adds up
+            data = await loop.run_in_executor(self.encode_executor, self.encoder.encode, pcm)
+            if data:
+                await self._write(data)
+            pacer.advance(self.frame_seconds)
+
+    async def _write(self, data: bytes):
+        start = self.written % self.capacity
+        end = start + len(data)
+        if end <= self.capacity:
+            self.ring[start:end] = data
+        else:
+            split = self.capacity - start
+            self.ring[start:] = data[:split]
+            self.ring[:end - self.capacity] = data[split:]
+        self.chunk_offsets.append(self.written)
+        self.written += len(data)
+        async with self.condition:
+            self.condition.notify_all()
+
+    def _read(self, cursor: int, end: int) -> bytes:
+        start = cursor % self.capacity
+        stop = start + (end - cursor)
+        if stop <= self.capacity:
+            return bytes(self.ring[start:stop])
+        return bytes(self.ring[start:]) + bytes(self.ring[:stop - self.capacity])
+
+    async def listen(self):
+        """Async generator of stream bytes for one HTTP listener, starting live."""
+        self.listeners += 1
+        self.start()
+        try:
+            yield self.encoder.header()
+            # Join at the start of the latest encoded chunk (an MP3 frame boundary)
+            cursor = self.chunk_offsets[-1] if self.chunk_offsets else self.written
+            while True:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: self.written > cursor)
+                if self.written - cursor > self.capacity:
+                    # Listener fell a whole buffer behind: skip to the newest chunk
+                    cursor = self.chunk_offsets[-1]
+                end = self.written
+                yield self._read(cursor, end)
+                cursor = end
+        finally:
+            self.listeners -= 1
+            if not self.listeners:
+                self.stop()
+
+    def stats(self):
+        return {
+            "listeners": self.listeners,
+            "content_type": self.content_type,
+            "bytes_encoded": self.written,
+            "encoding": self.task is not None,
+        }
@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import queue
+import hashlib
+import threading
+from types import MappingProxyType
+
+STATION_JOURNAL_DIR = os.path.join(".cache", "stations")
+COMPACT_EVERY = 256  # records appended before the journal is rewritten as one snapshot
+SAFE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def journal_path(journal_dir, station_id):
+    """Station ids come from query strings, so anything unusual is hashed."""
+    name = station_id if SAFE_NAME.match(station_id) else hashlib.sha1(station_id.encode()).hexdigest()
+    return os.path.join(journal_dir, f"{name}.jsonl")
+
+
+def _plain(value):
+    # Queue item data is exposed as read-only mapping proxies
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+def item_record(item):
+    record = {"id": item.id, "type": item.type, "data": item.data}
+    if item.status:
+        record["status"] = item.status
+    if item.context is not None:
+        record["context"] = item.context
+    if item.audio:
+        record["audio"] = item.audio
+    return record
+
+
+def new_state(station_id):
+    return {
+        "station_id": station_id,
+        "playlist_id": None,
+        "running": False,
+        "version": 0,
+        "next_item_id": 0,
+        "items": [],
+        "current_index": 0,
+        "played_songs": set(),
+        "used_articles": set(),
+    }
+
+
+def _note_history(state, items):
+    """Songs and articles handed out, so a restored station doesn't repeat them."""
+    for item in items:
+        data = item["data"]
+        if item["type"] == "song" and data.get("uri"):
+            state["played_songs"].add(data["uri"])
+        elif item["type"] == "conversation_placeholder" and data.get("type") == "news_description":
+            state["used_articles"].add(data["article"]["link"])
+
+
+def apply_record(state, record):
+    """Replay one journal record onto a state dict (see new_state)."""
+    op = record["op"]
+    state["version"] = record.get("version", state["version"])
+    if op == "snapshot":
+        state.update({key: value for key, value in record.items() if key not in ("op", "version")})
+        state["played_songs"] = set(record["played_songs"])
+        state["used_articles"] = set(record["used_articles"])
+    elif op == "start":
+        state.update(station_id=record["station_id"], playlist_id=record["playlist_id"], running=True)
+    elif op == "stop":
+        state["running"] = False
+    elif op == "clear":
+        state.update(items=[], current_index=0, played_songs=set(), used_articles=set())
+    elif op == "extend":
+        state["items"].extend(record["items"])
+        state["next_item_id"] = record["items"][-1]["id"] + 1
+        _note_history(state, record["items"])
+    elif op == "update":
+        items = state["items"]
+        index = record["id"] - items[0]["id"] if items else -1
+        if 0 <= index < len(items) and items[index]["id"] == record["id"]:
+            items[index] = {**items[index], **record["changes"]}
+            items[index] = {key: value for key, value in items[index].items() if value is not None}
+    elif op == "advance":
+        state["current_index"] = record["next_id"] - state["items"][0]["id"] if state["items"] else 0
+
+
+class QueueJournal:
+    """
+    Append-only record of one station's queue: start/stop, items added,
+    item updates (scripts, ready audio files) and the position. Each record
+    is one JSON line, so a crashed process loses at most a torn last line.
+    Every COMPACT_EVERY records the file is rewritten as a single snapshot of
+    the live state (already played items dropped) via a fsynced temp file and
+    os.replace.
+    Records are made by the station's RadioQueue under its write lock, but
+    serialising and all file I/O happen on a writer thread, in record order,
+    so neither the lock nor the event loop ever waits on the disk. Records
+    only hold immutable queue items and fresh dicts, so handing them over
+    needs no copies. close() writes out everything pending.
+    """
+    def __init__(self, path, station_id, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self.state = new_state(station_id)  # session fields kept current for snapshots
+        self.file = None
+        self.records = 0
+        self.compactions = 0
+        self.errors = 0
+        self.jobs = queue.Queue()  # ("append" | "compact", record), None to finish
+        self.writer = None
+
+    @staticmethod
+    def read(path):
+        """Replay a journal file into a state dict, or None if it is missing or empty."""
+        if not os.path.exists(path):
+            return None
+        state = new_state(None)
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn write at the moment of the crash; nothing valid follows
+                    apply_record(state, record)
+        except OSError as e:
+            print(f"Could not read station journal {path}: {e}")
+            return None
+        return state if state["station_id"] else None
+
+    def _submit(self, kind, record):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._run, daemon=True,
+                                           name=f"journal-{self.state['station_id']}")
+            self.writer.start()
+        self.jobs.put((kind, record))
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            kind, record = job
+            if kind == "compact":
+                record["items"] = [item_record(item) for item in record["items"]]
+            line = json.dumps(record, default=_plain, separators=(",", ":")) + "\n"
+            if kind == "compact":
+                self._rewrite(line)
+            else:
+                self._append(line)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _append(self, line):
+        try:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, "a")
+            self.file.write(line)
+            self.file.flush()
+        except OSError as e:
+            self.errors += 1
+            print(f"Could not write station journal {self.path}: {e}")
+
+    def _rewrite(self, line):
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.errors += 1
+            print(f"Could not compact station journal {self.path}: {e}")
+            return
+        self.compactions += 1
+
+    def record(self, op, version, **fields):
+        """Queue one record for writing. Returns True when the journal is due for compaction."""
+        record = {"op": op, "version": version, **fields}
+        session = self.state
+        if op == "start":
+            record["station_id"] = session["station_id"]
+            session.update(playlist_id=fields["playlist_id"], running=True)
+        elif op == "stop":
+            session["running"] = False
+        elif op == "clear":
+            session.update(played_songs=set(), used_articles=set())
+        elif op == "extend":
+            _note_history(session, fields["items"])
+        self._submit("append", record)
+        self.records += 1
+        return self.records >= self.compact_every
+
+    def restore(self, state):
+        """Take over the session fields of a state read back with read()."""
+        self.state.update(playlist_id=state["playlist_id"], running=state["running"],
+                          played_songs=set(state["played_songs"]),
+                          used_articles=set(state["used_articles"]))
+
+    def compact(self, snapshot, next_item_id):
+        """Queue a rewrite of the journal as one snapshot record, from the item on air onwards."""
+        first = max(snapshot.current_index - 1, 0)
+        record = {
+            "op": "snapshot",
+            "version": snapshot.version,
+            "station_id": self.state["station_id"],
+            "playlist_id": self.state["playlist_id"],
+            "running": self.state["running"],
+            "next_item_id": next_item_id,
+            "items": snapshot.items[first:],  # immutable; made into records by the writer
+            "current_index": snapshot.current_index - first,
+            # Copied now: the session sets keep changing while the writer catches up
+            "played_songs": sorted(self.state["played_songs"]),
+            "used_articles": sorted(self.state["used_articles"]),
+        }
+        self._submit("compact", record)
+        self.records = 0
+
+    def close(self):
+        """Write out everything queued and close the file (blocks until the writer is done)."""
+        if self.writer is not None:
+            self.jobs.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def stats(self):
+        return {"records_since_compaction": self.records, "compactions": self.compactions,
+                "errors": self.errors, "pending_writes": self.jobs.qsize()}
@@ -0,0 +1,89 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+LOOKAHEAD_ITEMS = 8    # how far down the queue to prepare conversations
+LOOKAHEAD_WORKERS = 3  # scripts + TTS in flight at once, across all stations
+
+STATUS_GENERATING = "generating"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+def create_lookahead_executor(workers=LOOKAHEAD_WORKERS):
+    """One bounded pool shared by every station, so lookahead can't swamp OpenAI."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lookahead")
+
+
+class LookaheadPipeline:
+    """
+    Prepares upcoming conversations for one station well before they are due.
+    poke() walks the next `depth` queue items and starts a job for every
+    conversation that isn't being prepared yet: write the script (summary and
+    dialogue) and then synthesise every line, each step in the shared worker
+    pool. Progress is published as new versions of the item (generating,
+    the written script, then its audio files and ready), so the station can
+    put it on air without waiting on OpenAI. Jobs are asyncio tasks.
+    """
+    def __init__(self, station, executor, depth=LOOKAHEAD_ITEMS):
+        self.station = station
+        self.executor = executor
+        self.depth = depth
+        self.jobs = {}  # queue item id -> task
+
+    def poke(self):
+        """Start jobs for any upcoming conversation that doesn't have one yet."""
+        for item in self.station.queue.snapshot.upcoming(self.depth):
+            if item.type == "song" or item.status == STATUS_READY or item.id in self.jobs:
+                continue
+            self.jobs[item.id] = asyncio.create_task(self._prepare(item))
+
+    async def wait(self, item):
+        """Wait for the item's job, if it has one. Returns the ready item, or None."""
+        job = self.jobs.pop(item.id, None)
+        if job is not None:
+            await asyncio.shield(job)
+        latest = self.station.queue.snapshot.get(item.id)
+        return latest if latest is not None and latest.status == STATUS_READY else None
+
+    def cancel(self):
+        for job in self.jobs.values():
+            job.cancel()
+        self.jobs.clear()
+
+    def _publish(self, item_id, **changes):
+        snapshot, item = self.station.queue.update(item_id, **changes)
+        self.station.events.updated(snapshot, item)
+        return item
+
+    async def _prepare(self, item):
+        loop = asyncio.get_running_loop()
+        item = self._publish(item.id, status=STATUS_GENERATING)
+        if item is None:
+            return  # the station restarted before the job began
+        try:
+            if item.type == "conversation_placeholder":
+                speeches = await loop.run_in_executor(self.executor, self.station.generate_conversation,
+                                                      item.data)
+                item = self._publish(item.id, type="conversation", data=speeches, context=item.data)
+                if item is None:
+                    return
+            audio = await loop.run_in_executor(
+                self.executor, self.station.services.voice_generator.generate_files, item.data
+            )
+            self._publish(item.id, audio=audio, status=STATUS_READY)
+        except asyncio.CancelledError:
+            # Published like every other status change, so clients stop showing it as in progress
+            self._publish(item.id, status=None)
+            raise
+        except Exception as e:
+            print(f"[{self.station.station_id}] lookahead failed for item {item.id}: {e}")
+            self._publish(item.id, status=STATUS_FAILED)
+
+    def stats(self):
+        snapshot = self.station.queue.snapshot
+        pending = [item for item in snapshot.items[snapshot.current_index:] if item.type != "song"]
+        return {
+            "jobs": len(self.jobs),
+            "ready": sum(1 for item in pending if item.status == STATUS_READY),
+            "upcoming_conversations": len(pending),
+        }
@@ -0,0 +1,48 @@
+import time
+import asyncio
+from collections import deque
+
+LAG_CHECK_INTERVAL_S = 0.1
+LAG_WARNING_MS = 50
+LAG_SAMPLES = 600  # ~1 minute of history
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a short sleep wakes up. Anything blocking
+    the loop (e.g. decoding audio inline) shows up here, and spikes are logged.
+    """
+    def __init__(self, interval=LAG_CHECK_INTERVAL_S, warning_ms=LAG_WARNING_MS):
+        self.interval = interval
+        self.warning_ms = warning_ms
+        self.samples = deque(maxlen=LAG_SAMPLES)
+        self.max_lag_ms = 0.0
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = (time.perf_counter() - start - self.interval) * 1000
+            self.samples.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms > self.warning_ms:
+                print(f"[LoopLag] event loop blocked for ~{lag_ms:.0f} ms")
+
+    def stats(self):
+        if not self.samples:
+            return {"samples": 0}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "mean_ms": round(sum(ordered) / len(ordered), 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+            "max_ms": round(self.max_lag_ms, 2),
+        }
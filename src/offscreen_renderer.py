@@ -0,0 +1,148 @@
+import os
+import sys
+import argparse
+import multiprocessing
+import numpy as np
+import pygame
+from pydub import AudioSegment
+
+from .audio_analysis import segment_to_array, rms_envelope
+from .visualiser import (
+    WaveRenderer, SCREEN_WIDTH, SCREEN_HEIGHT, BACKGROUND_COLOUR, FPS, WINDOW_SIZE_MS,
+    ENVELOPE_HOP_MS, AMPLITUDE_HISTORY_SIZE, AMPLITUDE_SCALING, WAVE_PHASE_SPEED,
+    SPEAKER_COLOURS
+)
+
+CHUNK_FRAMES = 120
+
+
+def build_timeline(clips, fps=FPS):
+    """
+    Lay the clips end to end and compute the smoothed wave amplitude for every
+    output frame up front.
+    Args:
+        clips: list of (audio_file, speaker) in playback order.
+    Returns:
+        (amplitudes, speakers): per-frame amplitude array and speaker names.
+    """
+    amplitudes = []
+    speakers = []
+    for audio_file, speaker in clips:
+        audio_segment = AudioSegment.from_file(audio_file)
+        samples = segment_to_array(audio_segment).mean(axis=0)
+        envelope = rms_envelope(samples, audio_segment.frame_rate, WINDOW_SIZE_MS, ENVELOPE_HOP_MS)
+
+        num_frames = int(np.ceil(len(audio_segment) * fps / 1000))
+        pos_ms = (np.arange(num_frames) * 1000 / fps).astype(np.int64)
+        index = np.minimum(pos_ms // ENVELOPE_HOP_MS, len(envelope) - 1)
+        frame_amp = envelope[index].astype(np.float64) if len(envelope) else np.zeros(num_frames)
+
+        # Same trailing mean as the live ring buffer, reset at each clip boundary
+        cumulative = np.concatenate([[0.0], np.cumsum(frame_amp)])
+        ends = np.arange(1, num_frames + 1)
+        starts = np.maximum(0, ends - AMPLITUDE_HISTORY_SIZE)
+        smoothed = (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+        amplitudes.append(smoothed * AMPLITUDE_SCALING)
+        speakers.extend([speaker] * num_frames)
+
+    if not amplitudes:
+        return np.zeros(0), []
+    return np.concatenate(amplitudes), speakers
+
+
+def _init_worker():
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.init()
+
+
+def _render_chunk(args):
+    """
+    Render frames [start, start + len(amplitudes)) of the timeline. Writes PNGs
+    if output_dir is given, otherwise returns the raw RGB24 bytes of the frames.
+    """
+    start, amplitudes, speakers, fps, output_dir = args
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    renderer = WaveRenderer()
+    to_bytes = getattr(pygame.image, "tobytes", None) or pygame.image.tostring
+
+    raw_frames = []
+    for offset, (amplitude, speaker) in enumerate(zip(amplitudes, speakers)):
+        frame_index = start + offset
+        surface.fill(BACKGROUND_COLOUR)
+        colour = SPEAKER_COLOURS.get(speaker, SPEAKER_COLOURS['default'])
+        renderer.draw(surface, amplitude, frame_index / fps * WAVE_PHASE_SPEED, colour)
+
+        if output_dir:
+            pygame.image.save(surface, os.path.join(output_dir, f"frame_{frame_index:06d}.png"))
+        else:
+            raw_frames.append(to_bytes(surface, "RGB"))
+    return b"".join(raw_frames)
+
+
+def render_offscreen(clips, fps=FPS, output_dir=None, output_stream=None, workers=None,
+                     chunk_frames=CHUNK_FRAMES):
+    """
+    Render the visualiser animation for a finished conversation faster than real time.
+    The timeline is split into chunks that are rendered in parallel worker processes.
+    Args:
+        clips: list of (audio_file, speaker).
+        fps: output frame rate.
+        output_dir: write frame_000000.png, ... here.
+        output_stream: or write raw RGB24 frames (in order) to this binary stream,
+            e.g. ffmpeg's stdin.
+        workers: number of processes (defaults to the CPU count).
+    Returns:
+        Number of frames rendered.
+    """
+    if (output_dir is None) == (output_stream is None):
+        raise ValueError("Pass exactly one of output_dir or output_stream")
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    amplitudes, speakers = build_timeline(clips, fps)
+    total = len(amplitudes)
+    jobs = [
+        (start, amplitudes[start:start + chunk_frames], speakers[start:start + chunk_frames],
+         fps, output_dir)
+        for start in range(0, total, chunk_frames)
+    ]
+
+    with multiprocessing.Pool(workers or os.cpu_count(), initializer=_init_worker) as pool:
+        # imap keeps chunk order, so raw frames reach the stream in sequence
+        for raw in pool.imap(_render_chunk, jobs):
+            if output_stream is not None:
+                output_stream.write(raw)
+    if output_stream is not None:
+        output_stream.flush()
+    return total
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Render the host visualiser offscreen.')
+    parser.add_argument('clips', nargs='+', help='Audio clips as path:speaker (e.g. speeches/speech_1_matt.mp3:matt)')
+    parser.add_argument('--fps', type=int, default=FPS, help='Output frame rate.')
+    parser.add_argument('--out', help='Directory for the PNG sequence.')
+    parser.add_argument('--raw', action='store_true', help='Write raw RGB24 frames to stdout instead.')
+    parser.add_argument('--workers', type=int, default=None, help='Number of render processes.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    clips = []
+    for clip in args.clips:
+        path, _, speaker = clip.rpartition(':')
+        clips.append((path, speaker.lower()) if path else (speaker, 'default'))
+
+    if args.raw:
+        print(f"Pipe into e.g.: ffmpeg -f rawvideo -pix_fmt rgb24 -s {SCREEN_WIDTH}x{SCREEN_HEIGHT} "
+              f"-r {args.fps} -i - out.mp4", file=sys.stderr)
+        total = render_offscreen(clips, args.fps, output_stream=sys.stdout.buffer, workers=args.workers)
+    else:
+        total = render_offscreen(clips, args.fps, output_dir=args.out or "frames", workers=args.workers)
+    print(f"Rendered {total} frames.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import struct
+import numpy as np
+
+# PyAV ships with aiortc (already in requirements.txt); Opus is optional without it
+try:
+    import av
+except ImportError:
+    av = None
+
+OPUS_AVAILABLE = av is not None
+OPUS_BITRATE = 32000
+OPUS_FRAME_MS = 20
+
+_PACKET_LENGTH = struct.Struct("<H")
+
+
+class OpusEncoder:
+    """
+    Stateful Opus encoder for one mono PCM16 stream. Each broadcast frame is
+    encoded here exactly once, whatever the number of listeners.
+    """
+    def __init__(self, sample_rate=24000, bitrate=OPUS_BITRATE):
+        if av is None:
+            raise RuntimeError("Opus streaming needs PyAV (pip install av)")
+        self.sample_rate = sample_rate
+        self.samples_per_packet = sample_rate * OPUS_FRAME_MS // 1000
+        self.codec = av.CodecContext.create("libopus", "w")
+        self.codec.sample_rate = sample_rate
+        self.codec.layout = "mono"
+        self.codec.format = "s16"
+        self.codec.bit_rate = bitrate
+        self.codec.options = {"application": "audio", "frame_duration": str(OPUS_FRAME_MS)}
+        self.pts = 0
+
+    def encode(self, pcm: bytes):
+        """Encode PCM16 (any length) into a list of 20 ms Opus packets."""
+        samples = np.frombuffer(pcm, dtype="<i2")
+        remainder = len(samples) % self.samples_per_packet
+        if remainder:
+            # Pad the tail of a clip with silence so every packet is a full frame
+            samples = np.concatenate([samples, np.zeros(self.samples_per_packet - remainder, dtype="<i2")])
+
+        packets = []
+        for start in range(0, len(samples), self.samples_per_packet):
+            chunk = samples[start:start + self.samples_per_packet].reshape(1, -1)
+            frame = av.AudioFrame.from_ndarray(chunk, format="s16", layout="mono")
+            frame.sample_rate = self.sample_rate
+            frame.pts = self.pts
+            self.pts += self.samples_per_packet
+            packets.extend(bytes(packet) for packet in self.codec.encode(frame))
+        return packets
+
+
+def pack_opus_packets(packets) -> bytes:
+    """Length-prefix (u16 LE) each Opus packet so several fit in one frame payload."""
+    return b"".join(_PACKET_LENGTH.pack(len(p)) + p for p in packets)
+
+
+def unpack_opus_packets(payload: bytes):
+    packets = []
+    pos = 0
+    while pos + _PACKET_LENGTH.size <= len(payload):
+        (length,) = _PACKET_LENGTH.unpack_from(payload, pos)
+        pos += _PACKET_LENGTH.size
+        packets.append(payload[pos:pos + length])
+        pos += length
+    return packets
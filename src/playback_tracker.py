@@ -0,0 +1,81 @@
+import time
+
+RESYNC_INTERVAL_S = 60        # routine check-in with Spotify while a song plays
+DRIFT_RESYNC_INTERVAL_S = 5   # check-in interval right after a seek/pause was detected
+DRIFT_TOLERANCE_MS = 1500     # prediction error that counts as a seek, pause or skip
+CONFIRM_BEFORE_END_MS = 8000  # confirm once with Spotify this close to the predicted end
+START_SYNC_ATTEMPTS = 3       # Spotify can take a moment to report a track we just started
+START_RETRY_S = 0.5
+
+
+class PlaybackTracker:
+    """
+    Predicts when the current Spotify track ends without polling.
+    sync() reads progress and duration once (a single current_playback call)
+    and turns them into an end time on a local monotonic clock; after that
+    remaining_ms() is pure arithmetic. The tracker re-syncs every
+    RESYNC_INTERVAL_S, once more just before the predicted end (so the
+    handover still lands within a poll interval if the listener paused or
+    seeked), and sooner after any drift is detected.
+    Blocking (it may call Spotify), so async callers run it in a thread.
+    """
+    def __init__(self, spotify_handler, clock=time.monotonic, resync_interval=RESYNC_INTERVAL_S,
+                 drift_tolerance_ms=DRIFT_TOLERANCE_MS):
+        self.spotify = spotify_handler
+        self.clock = clock
+        self.resync_interval = resync_interval
+        self.drift_tolerance_ms = drift_tolerance_ms
+
+        self.track_uri = None
+        self.end_at = None       # predicted end of the track on self.clock
+        self.next_sync = 0.0
+        self.confirmed = False   # the pre-handover check has been made for this track
+        self.syncs = 0           # Spotify calls made (for stats)
+        self.drift_events = 0
+
+    def start(self, track_uri=None):
+        """Begin tracking a track that was just started."""
+        self.track_uri = track_uri
+        self.end_at = None
+        self.confirmed = False
+        for attempt in range(START_SYNC_ATTEMPTS):
+            if attempt:
+                time.sleep(START_RETRY_S)
+            self.sync()
+            if self.end_at is not None:
+                break
+
+    def sync(self):
+        progress = self.spotify.get_playback_progress()
+        now = self.clock()
+        self.syncs += 1
+
+        if progress is None or (self.track_uri and progress['uri'] != self.track_uri):
+            # Paused, stopped or skipped to something else: the slot is over
+            self.end_at = None
+            return
+
+        predicted_end = self.end_at
+        self.end_at = now + (progress['duration_ms'] - progress['progress_ms']) / 1000
+        drifted = (predicted_end is not None
+                   and abs(self.end_at - predicted_end) * 1000 > self.drift_tolerance_ms)
+        if drifted:
+            self.drift_events += 1
+        self.next_sync = now + (DRIFT_RESYNC_INTERVAL_S if drifted else self.resync_interval)
+
+    def remaining_ms(self):
+        """Predicted milliseconds left in the track, or None if it is no longer playing."""
+        if self.end_at is None:
+            return None
+        now = self.clock()
+        remaining = (self.end_at - now) * 1000
+        if now >= self.next_sync or (remaining < CONFIRM_BEFORE_END_MS and not self.confirmed):
+            self.confirmed = self.confirmed or remaining < CONFIRM_BEFORE_END_MS
+            self.sync()
+            if self.end_at is None:
+                return None
+            remaining = (self.end_at - self.clock()) * 1000
+        return remaining
+
+    def stats(self):
+        return {"spotify_syncs": self.syncs, "drift_events": self.drift_events}
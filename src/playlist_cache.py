@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import threading
+
+PLAYLIST_CACHE_PATH = os.path.join(".cache", "playlists.json")
+SNAPSHOT_CHECK_INTERVAL_S = 300  # how often a cached playlist is checked for edits
+MAX_CACHED_PLAYLISTS = 50
+
+
+class PlaylistCache:
+    """
+    Track lists per playlist id, refetched only when the playlist's
+    snapshot_id changes. A cached playlist costs one small snapshot_id request
+    at most every SNAPSHOT_CHECK_INTERVAL_S, and none in between; picks are
+    then made in memory. Records are compact ({name, artist, uri, duration_ms})
+    and the cache is persisted so a restart starts warm.
+    """
+    def __init__(self, spotify_handler, cache_path=PLAYLIST_CACHE_PATH,
+                 check_interval=SNAPSHOT_CHECK_INTERVAL_S):
+        self.spotify = spotify_handler
+        self.cache_path = cache_path
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.playlists = {}   # playlist id -> {"snapshot_id": str, "tracks": [track]}
+        self.checked_at = {}  # playlist id -> monotonic time of the last snapshot check
+        self.fetches = 0
+        self.snapshot_checks = 0
+        self._load()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                stored = json.load(f)
+            # On disk each track is a [uri, name, artist, duration_ms] row
+            self.playlists = {
+                playlist_id: {
+                    "snapshot_id": entry["snapshot_id"],
+                    "tracks": [
+                        {"uri": uri, "name": name, "artist": artist, "duration_ms": duration_ms}
+                        for uri, name, artist, duration_ms in entry["tracks"]
+                    ]
+                }
+                for playlist_id, entry in stored.items()
+            }
+        except Exception as e:
+            print(f"Could not read playlist cache: {e}")
+            self.playlists = {}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        stored = {
+            playlist_id: {
+                "snapshot_id": entry["snapshot_id"],
+                "tracks": [[t["uri"], t["name"], t["artist"], t["duration_ms"]] for t in entry["tracks"]]
+            }
+            for playlist_id, entry in self.playlists.items()
+        }
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(stored, f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+
+    def tracks(self, playlist_id):
+        """The playlist's tracks, refetched only if its snapshot_id has changed."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.playlists.get(playlist_id)
+            if entry and now - self.checked_at.get(playlist_id, float("-inf")) < self.check_interval:
+                return entry["tracks"]
+
+        try:
+            snapshot_id = self.spotify.get_playlist_snapshot_id(playlist_id)
+            self.snapshot_checks += 1
+        except Exception as e:
+            if entry:
+                print(f"Playlist snapshot check failed, using cached tracks: {e}")
+                return entry["tracks"]
+            raise
+
+        if entry and entry["snapshot_id"] == snapshot_id:
+            with self.lock:
+                self.checked_at[playlist_id] = now
+            return entry["tracks"]
+
+        tracks = self.spotify.get_playlist_tracks(playlist_id)
+        self.fetches += 1
+        with self.lock:
+            self.playlists.pop(playlist_id, None)
+            self.playlists[playlist_id] = {"snapshot_id": snapshot_id, "tracks": tracks}
+            self.checked_at[playlist_id] = now
+            while len(self.playlists) > MAX_CACHED_PLAYLISTS:
+                self.playlists.pop(next(iter(self.playlists)))
+            try:
+                self._save()
+            except Exception as e:
+                print(f"Could not write playlist cache: {e}")
+        return tracks
+
+    def stats(self):
+        return {
+            "playlists": len(self.playlists),
+            "tracks": sum(len(entry["tracks"]) for entry in self.playlists.values()),
+            "full_fetches": self.fetches,
+            "snapshot_checks": self.snapshot_checks,
+        }
@@ -0,0 +1,115 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .station_clock import StationClock, FramePacer
+from .host_audio import HOST_SAMPLE_RATE, ENVELOPE_STEP_MS
+
+PLAYOUT_LEAD_S = 0.5  # head start every output gets before a segment's start time
+
+
+class Segment:
+    """One decoded clip placed on the station timeline."""
+    def __init__(self, audio_file, speaker, frames, start):
+        self.audio_file = audio_file
+        self.speaker = speaker
+        self.frames = frames  # [(pcm16 bytes, envelope bytes), ...]
+        self.start = start
+        self.duration = sum(len(pcm) for pcm, _ in frames) / (2 * HOST_SAMPLE_RATE)
+        self.end = start + self.duration
+
+
+class PlayoutScheduler:
+    """
+    Owns the station timeline. Each clip is decoded once, given a start time on
+    the StationClock straight after the previous segment, and handed to every
+    sink (local speakers, websocket, HTTP stream) with that same start time,
+    so all outputs see the same segment boundaries at the same moment.
+    Runs on the event loop; threads use run_coroutine_threadsafe.
+    """
+    def __init__(self, clock: StationClock, decode_pool, sinks=()):
+        self.clock = clock
+        self.decode_pool = decode_pool
+        self.sinks = list(sinks)
+        self.timeline_end = 0.0
+        self.lock = asyncio.Lock()
+        self.tasks = set()
+
+    async def schedule(self, audio_file, speaker, frames=None) -> Segment:
+        """
+        Decode a clip (unless its frames are passed in) and queue it on every
+        sink. Returns once it is scheduled.
+        """
+        if frames is None:
+            frames = await self.decode_pool.decode(audio_file)
+        async with self.lock:
+            start = max(self.clock.now() + PLAYOUT_LEAD_S, self.timeline_end)
+            segment = Segment(audio_file, speaker.lower(), frames, start)
+            self.timeline_end = segment.end
+            for sink in self.sinks:
+                task = asyncio.create_task(sink.play(segment))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        return segment
+
+    async def cancel(self):
+        """Take everything scheduled off air (station stopped) and reset the timeline."""
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for sink in self.sinks:
+            sink.stop()
+        self.timeline_end = 0.0
+
+
+class BroadcastSink:
+    """Streams a segment's frames to websocket listeners, paced from its start time."""
+    def __init__(self, broadcaster, clock: StationClock):
+        self.broadcaster = broadcaster
+        self.clock = clock
+
+    async def play(self, segment: Segment):
+        pacer = FramePacer(self.clock, start=segment.start)
+        for pcm, envelope in segment.frames:
+            pts = await pacer.wait()
+            self.broadcaster.publish_audio(pcm, segment.speaker, envelope,
+                                           ENVELOPE_STEP_MS, timestamp=pts)
+            pacer.advance(len(pcm) / (2 * HOST_SAMPLE_RATE))
+
+    def stop(self):
+        pass  # frames are only published by play(), so cancelling it is enough
+
+
+class HttpStreamSink:
+    """Hands a segment to the HTTP station stream, which airs frames by timestamp."""
+    def __init__(self, http_stream):
+        self.http_stream = http_stream
+
+    async def play(self, segment: Segment):
+        pts = segment.start
+        for pcm, _ in segment.frames:
+            self.http_stream.push(pcm, pts)
+            pts += len(pcm) / (2 * HOST_SAMPLE_RATE)
+
+    def stop(self):
+        # play() hands over every frame at once, so drop what hasn't aired yet
+        self.http_stream.pending.clear()
+
+
+class LocalSink:
+    """Plays a segment on the local speakers (pygame) starting at its start time."""
+    def __init__(self, audio_player, clock: StationClock):
+        self.audio_player = audio_player
+        self.clock = clock
+        # One thread: pygame's music channel plays one file at a time
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-playout")
+
+    async def play(self, segment: Segment):
+        await self.clock.sleep_until(segment.start)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.audio_player._play_file,
+                                   segment.audio_file, segment.speaker)
+
+    def stop(self):
+        # Cancelling play() can't interrupt a clip already playing in the executor
+        self.audio_player.stop()
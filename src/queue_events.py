@@ -0,0 +1,111 @@
+import json
+import asyncio
+
+QUEUE_EVENT_BUFFER = 100  # events a slow client may fall behind before it is made to resync
+KEEPALIVE_SECONDS = 15
+SNIPPET_CHARS = 120
+
+
+def project_item(item):
+    """
+    What a client needs to draw one queue row: no article bodies, no file
+    paths, at most a snippet of the first line of dialogue.
+    """
+    out = {"id": item.id, "type": item.type}
+    if item.status:
+        out["status"] = item.status
+    data = item.data
+    if item.type == "song":
+        out["name"] = data["name"]
+        out["artist"] = data["artist"]
+    elif item.type == "conversation":
+        out["lines"] = len(data)
+        out["snippet"] = data[0][:SNIPPET_CHARS] if data else ""
+    elif item.type == "conversation_placeholder":
+        if data["type"] == "song_description":
+            out["about"] = f"{data['song_name']} by {data['artist']}"
+        elif data["type"] == "news_description":
+            out["about"] = data["article"]["title"]
+    return out
+
+
+class QueueEventHub:
+    """
+    Pushes a station's queue changes to Server-Sent Events clients as
+    versioned diffs: "insert" (new rows at an index), "update" (one row
+    changed), "advance" (current index moved) and "reset" (full snapshot, sent
+    on connect and when the station restarts). Every event carries the
+    version of the queue snapshot it describes, and each is serialised once
+    for all clients. A client that falls QUEUE_EVENT_BUFFER events behind is
+    disconnected; EventSource reconnects and gets a fresh snapshot.
+    Must be used from the event loop thread.
+    """
+    def __init__(self, station):
+        self.station = station
+        self.subscribers = set()
+        self.events_sent = 0
+
+    def _publish(self, kind, version, payload):
+        message = self._format(kind, version, payload)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind to patch: end its stream so it reconnects and resyncs
+                self.subscribers.discard(subscriber)
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                subscriber.put_nowait(None)
+        self.events_sent += 1
+
+    @staticmethod
+    def _format(kind, version, payload):
+        return f"event: {kind}\ndata: {json.dumps({'version': version, **payload})}\n\n"
+
+    def snapshot(self, snapshot=None):
+        """Projected rows of one queue snapshot (the current one by default)."""
+        snapshot = snapshot or self.station.queue.snapshot
+        return {
+            "version": snapshot.version,
+            "items": [project_item(item) for item in snapshot.items],
+            "currentIndex": snapshot.current_index,
+        }
+
+    def reset(self, snapshot):
+        projected = self.snapshot(snapshot)
+        self._publish("reset", projected.pop("version"), projected)
+
+    def inserted(self, snapshot, items):
+        index = snapshot.index_of(items[0].id) if items else len(snapshot.items)
+        self._publish("insert", snapshot.version,
+                      {"index": index, "items": [project_item(item) for item in items]})
+
+    def updated(self, snapshot, item):
+        if snapshot is not None:
+            self._publish("update", snapshot.version, {"item": project_item(item)})
+
+    def advanced(self, snapshot):
+        self._publish("advance", snapshot.version, {"currentIndex": snapshot.current_index})
+
+    async def listen(self):
+        """Async generator of SSE text for one client: a snapshot, then diffs."""
+        subscriber = asyncio.Queue(maxsize=QUEUE_EVENT_BUFFER)
+        self.subscribers.add(subscriber)
+        try:
+            projected = self.snapshot()
+            yield self._format("reset", projected.pop("version"), projected)
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            self.subscribers.discard(subscriber)
+
+    def stats(self):
+        return {"listeners": len(self.subscribers), "version": self.station.queue.snapshot.version,
+                "events_sent": self.events_sent}
@@ -0,0 +1,155 @@
+import threading
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Any, Optional, Tuple
+
+from .journal import item_record
+
+
+def freeze(data):
+    """
+    Read-only copy of item data, all the way down: dicts become mapping proxies
+    over a private copy, lists and tuples become tuples. The caller's objects
+    (e.g. a cached article dict) are never shared with the queue.
+    """
+    if isinstance(data, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(value) for key, value in data.items()})
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(value) for value in data)
+    return data
+
+
+@dataclass(frozen=True)
+class QueueItem:
+    """
+    One queue entry. Never changed in place: preparing or playing an item
+    publishes a new record with the same id.
+    """
+    id: int
+    type: str                   # "song", "conversation_placeholder" or "conversation"
+    data: Any                   # song info, placeholder description or tuple of dialogue lines
+    status: Optional[str] = None  # lookahead state (see lookahead.STATUS_*)
+    context: Any = None         # the placeholder a conversation was written from
+    audio: Tuple = ()           # ((audio_file, speaker), ...) once synthesised
+
+
+@dataclass(frozen=True)
+class QueueSnapshot:
+    """The whole queue at one version. Items are consecutive ids, so lookups are O(1)."""
+    version: int
+    items: Tuple[QueueItem, ...] = ()
+    current_index: int = 0
+
+    def get(self, item_id):
+        if not self.items:
+            return None
+        index = item_id - self.items[0].id
+        if 0 <= index < len(self.items) and self.items[index].id == item_id:
+            return self.items[index]
+        return None
+
+    def index_of(self, item_id):
+        item = self.get(item_id)
+        return None if item is None else item_id - self.items[0].id
+
+    def upcoming(self, count):
+        return self.items[self.current_index:self.current_index + count]
+
+    @property
+    def remaining(self):
+        return len(self.items) - self.current_index
+
+
+class RadioQueue:
+    """
+    A station's queue as copy-on-write snapshots. Every change builds a new
+    QueueSnapshot with the next version and swaps it in with one assignment,
+    so readers (HTTP handlers, the SSE hub, stats) just take `snapshot` and get
+    a consistent view without locking. Writers serialise on a lock that
+    readers never touch. Each write returns the snapshot it produced, so
+    callers can announce exactly that version. With a journal, every write
+    is also recorded there in the same order.
+    """
+    def __init__(self, journal=None):
+        self.lock = threading.Lock()
+        self.journal = journal
+        self.next_item_id = 0
+        self.snapshot = QueueSnapshot(version=0)
+
+    def _swap(self, **changes):
+        snapshot = replace(self.snapshot, version=self.snapshot.version + 1, **changes)
+        self.snapshot = snapshot
+        return snapshot
+
+    def _log(self, op, **fields):
+        if self.journal and self.journal.record(op, self.snapshot.version, **fields):
+            self.journal.compact(self.snapshot, self.next_item_id)
+
+    def mark(self, op, **fields):
+        """Journal a station event that isn't a queue change (start, stop)."""
+        with self.lock:
+            self._log(op, **fields)
+
+    def clear(self):
+        with self.lock:
+            snapshot = self._swap(items=(), current_index=0)
+            self._log("clear")
+            return snapshot
+
+    def restore(self, state):
+        """Replace the queue with one read back from a journal (see journal.QueueJournal.read)."""
+        with self.lock:
+            items = tuple(
+                QueueItem(record["id"], record["type"], freeze(record["data"]), record.get("status"),
+                          freeze(record.get("context")),
+                          tuple(tuple(clip) for clip in record.get("audio", ())))
+                for record in state["items"]
+            )
+            self.next_item_id = max(self.next_item_id, state["next_item_id"])
+            self.snapshot = QueueSnapshot(max(self.snapshot.version, state["version"]) + 1,
+                                          items, state["current_index"])
+            if self.journal:
+                self.journal.restore(state)
+                self.journal.compact(self.snapshot, self.next_item_id)
+            return self.snapshot
+
+    def extend(self, entries):
+        """Append (type, data) pairs with fresh ids. Returns (snapshot, new items)."""
+        with self.lock:
+            items = []
+            for item_type, data in entries:
+                items.append(QueueItem(self.next_item_id, item_type, freeze(data)))
+                self.next_item_id += 1
+            snapshot = self._swap(items=self.snapshot.items + tuple(items))
+            self._log("extend", items=[item_record(item) for item in items])
+            return snapshot, items
+
+    def update(self, item_id, **changes):
+        """
+        Replace one item with a copy carrying `changes`. Returns (snapshot, new
+        item), or (None, None) if the item is gone (e.g. the station restarted).
+        """
+        with self.lock:
+            index = self.snapshot.index_of(item_id)
+            if index is None:
+                return None, None
+            for key in ("data", "context"):
+                if key in changes:
+                    changes[key] = freeze(changes[key])
+            if "audio" in changes:
+                changes["audio"] = tuple(changes["audio"])
+            item = replace(self.snapshot.items[index], **changes)
+            items = self.snapshot.items
+            snapshot = self._swap(items=items[:index] + (item,) + items[index + 1:])
+            self._log("update", id=item_id, changes=changes)
+            return snapshot, item
+
+    def advance(self):
+        """Move past the current item. Returns (snapshot, the item now on air)."""
+        with self.lock:
+            current = self.snapshot
+            item = current.items[current.current_index]
+            snapshot = self._swap(current_index=current.current_index + 1)
+            # By id: compaction drops played items, so indices in the journal shift
+            self._log("advance", next_id=item.id + 1)
+            return snapshot, item
@@ -0,0 +1,190 @@
+import time
+import threading
+from collections import OrderedDict
+
+import requests
+import spotipy
+from spotipy.exceptions import SpotifyException
+from urllib3.util.retry import Retry
+
+RATE_LIMIT_PER_SECOND = 5.0  # sustained Spotify calls per second, across all stations
+RATE_LIMIT_BURST = 10
+MAX_RATE_LIMIT_RETRIES = 3
+DEFAULT_RETRY_AFTER_S = 1.0
+SEARCH_CACHE_TTL_S = 3600
+MAX_SEARCH_CACHE_ENTRIES = 1000
+TRANSPORT_RETRIES = 3                            # spotipy's default, for connection errors and 5xx
+TRANSPORT_RETRY_STATUSES = (500, 502, 503, 504)  # 429 is left to RateLimitedSpotify
+
+
+def create_spotify(**kwargs):
+    """
+    A spotipy.Spotify whose HTTP session retries connection errors and 5xx
+    responses itself but never 429s. spotipy can't be told to ignore
+    Retry-After (urllib3 would sleep on it inside the request) and turns an
+    exhausted retry into a SpotifyException(429) without headers, so the
+    session is built here and a 429 reaches RateLimitedSpotify as a plain
+    HTTP error with its Retry-After header.
+    """
+    retry = Retry(
+        total=TRANSPORT_RETRIES,
+        connect=None,
+        read=False,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status=TRANSPORT_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=TRANSPORT_RETRY_STATUSES,
+        respect_retry_after_header=False,
+        raise_on_status=False,  # out of retries: surface the last 5xx as itself
+    )
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return spotipy.Spotify(requests_session=session, status_forcelist=TRANSPORT_RETRY_STATUSES,
+                           **kwargs)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; acquire() blocks until a call is allowed.
+    `clock` and `sleep` default to time.monotonic and time.sleep.
+    """
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            self.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds` (Spotify's Retry-After)."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.tokens = 0.0
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "mean_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class RateLimitedSpotify:
+    """
+    Drop-in wrapper around a spotipy.Spotify client. Every method call goes
+    through one token bucket, a 429 pauses all callers for the Retry-After
+    period before retrying, and latency/error counters are kept per endpoint
+    (method name). search() results are memoised with a TTL.
+    Create the spotipy client with create_spotify() so 429s surface here
+    instead of being retried inside spotipy. `clock` and `sleep` (used for the
+    bucket and the search TTL) default to time.monotonic and time.sleep.
+    """
+    def __init__(self, sp, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST,
+                 search_ttl=SEARCH_CACHE_TTL_S, clock=time.monotonic, sleep=time.sleep):
+        self.sp = sp
+        self.clock = clock
+        self.bucket = TokenBucket(rate, burst, clock, sleep)
+        self.search_ttl = search_ttl
+        self.search_cache = OrderedDict()  # (args, kwargs) -> (expires_at, result)
+        self.search_hits = 0
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.sp, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._call(name, attr, args, kwargs)
+        return call
+
+    def _record(self, name, elapsed_ms=None, error=False, rate_limited=False):
+        with self.lock:
+            metrics = self.metrics.setdefault(name, EndpointMetrics())
+            metrics.calls += 1
+            if elapsed_ms is not None:
+                metrics.total_ms += elapsed_ms
+                metrics.max_ms = max(metrics.max_ms, elapsed_ms)
+            metrics.errors += error
+            metrics.rate_limited += rate_limited
+
+    def _call(self, name, fn, args, kwargs):
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except SpotifyException as e:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if e.http_status == 429:
+                    self._record(name, elapsed_ms, error=True, rate_limited=True)
+                    if attempt < MAX_RATE_LIMIT_RETRIES:
+                        headers = getattr(e, "headers", None) or {}
+                        retry_after = float(headers.get("Retry-After", DEFAULT_RETRY_AFTER_S))
+                        print(f"Spotify rate limited on {name}; retrying in {retry_after:.0f}s")
+                        self.bucket.pause(retry_after)
+                        continue
+                else:
+                    self._record(name, elapsed_ms, error=True)
+                raise
+            except Exception:
+                self._record(name, (time.perf_counter() - start) * 1000, error=True)
+                raise
+            self._record(name, (time.perf_counter() - start) * 1000)
+            return result
+
+    def search(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = self.clock()
+        with self.lock:
+            cached = self.search_cache.get(key)
+            if cached and cached[0] > now:
+                self.search_cache.move_to_end(key)
+                self.search_hits += 1
+                return cached[1]
+
+        result = self._call("search", self.sp.search, args, kwargs)
+        with self.lock:
+            self.search_cache[key] = (now + self.search_ttl, result)
+            self.search_cache.move_to_end(key)
+            while len(self.search_cache) > MAX_SEARCH_CACHE_ENTRIES:
+                self.search_cache.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "endpoints": {name: m.to_dict() for name, m in self.metrics.items()},
+                "search_cache_hits": self.search_hits,
+                "search_cache_size": len(self.search_cache),
+            }
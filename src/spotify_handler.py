@@ -1,73 +1,135 @@
 import os
 import random
-import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from .playlist_cache import PlaylistCache
+from .spotify_client import RateLimitedSpotify, create_spotify
+from .track_sequencer import FeatureStore
 
-class SpotifyHandler:
-    def __init__(self, username):
-        """Initialise Spotify client with OAuth"""
-        self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-            username=username,
-            client_id=os.getenv('SPOTIFY_CLIENT_ID'),
-            client_secret=os.getenv('SPOTIFY_CLIENT_SECRET'),
-            redirect_uri="http://www.example.com",
-            scope="user-library-read user-modify-playback-state user-read-playback-state user-top-read playlist-read-private"
-        ))
+# Spotify's own loudness normalisation targets roughly -14 LUFS; at this device
+# volume music sits close to the host clips normalised by LoudnessAnalyser.
+PLAYBACK_VOLUME = 60
+
+# Only ask for what a compact track record needs
+PLAYLIST_TRACK_FIELDS = "items(track(name,uri,type,duration_ms,artists(name))),next"
 
-    def get_random_playlist_song(self, playlist_id, played_songs):
+class SpotifyHandler:
+    def __init__(self, username, api_prefix=None):
         """
-        Get a random track from a given playlist that has not been played before.
+        Initialise Spotify client with OAuth.
         Args:
-            playlist_id (str): Spotify playlist ID.
-            played_songs (list): List of track URIs that have already been played.
+            api_prefix (str): Web API base URL to use instead of Spotify's, e.g. the local
+                fake in src/fake_spotify.py. Defaults to $SPOTIFY_API_PREFIX if set.
+        """
+        api_prefix = api_prefix or os.getenv('SPOTIFY_API_PREFIX')
+        if api_prefix:
+            # The fake server doesn't check tokens, so skip the OAuth flow entirely
+            client = create_spotify(auth="fake-token")
+            client.prefix = api_prefix if api_prefix.endswith('/') else api_prefix + '/'
+        else:
+            # 429s are handled (and Retry-After honoured) by RateLimitedSpotify
+            client = create_spotify(auth_manager=SpotifyOAuth(
+                username=username,
+                client_id=os.getenv('SPOTIFY_CLIENT_ID'),
+                client_secret=os.getenv('SPOTIFY_CLIENT_SECRET'),
+                redirect_uri="http://www.example.com",
+                scope="user-library-read user-modify-playback-state user-read-playback-state user-top-read playlist-read-private"
+            ))
+        self.sp = RateLimitedSpotify(client)
+        self.playlists = PlaylistCache(self)
+        self.features = FeatureStore(self)
+
+    def get_playlist_snapshot_id(self, playlist_id):
+        """The playlist's current snapshot_id (changes whenever the playlist is edited)."""
+        return self.sp.playlist(playlist_id, fields="snapshot_id")['snapshot_id']
+
+    def get_playlist_tracks(self, playlist_id):
+        """
+        Fetch every track of a playlist (all pages).
         Returns:
-            dict: Contains name, artist and uri of the randomly selected track, or None if no unique track is found.
+            list: dicts with name, artist, uri and duration_ms, skipping episodes and local files.
         """
-        # Fetch playlist tracks
         tracks = []
-        results = self.sp.playlist_tracks(playlist_id)
+        results = self.sp.playlist_tracks(playlist_id, fields=PLAYLIST_TRACK_FIELDS)
         tracks.extend(results['items'])
         while results['next']:
             results = self.sp.next(results)
             tracks.extend(results['items'])
-        
-        # Filter only tracks (not episodes, local tracks, etc.)
-        tracks = [track for track in tracks if track['track'] and track['track']['type'] == 'track']
+
+        return [
+            {
+                'name': item['track']['name'],
+                'artist': item['track']['artists'][0]['name'],
+                'uri': item['track']['uri'],
+                'duration_ms': item['track'].get('duration_ms')
+            }
+            for item in tracks if item['track'] and item['track']['type'] == 'track'
+        ]
+
+    def get_random_playlist_song(self, playlist_id, played_songs, tracks=None):
+        """
+        Get a random track from a given playlist that has not been played before.
+        Args:
+            playlist_id (str): Spotify playlist ID.
+            played_songs (set): Track URIs that have already been played.
+            tracks (list): Tracks to pick from (defaults to the cached playlist).
+        Returns:
+            dict: Contains name, artist, uri and duration_ms of the randomly selected track, or None if no unique track is found.
+        """
+        if tracks is None:
+            tracks = self.playlists.tracks(playlist_id)
 
         # Filter out tracks that have been played
-        available_tracks = [track for track in tracks if track['track']['uri'] not in played_songs]
+        available_tracks = [track for track in tracks if track['uri'] not in played_songs]
 
         if not available_tracks:
             return None
 
-        chosen = random.choice(available_tracks)['track']
-        return {
-            'name': chosen['name'],
-            'artist': chosen['artists'][0]['name'],
-            'uri': chosen['uri']
-        }
+        return dict(random.choice(available_tracks))
+
+    def get_audio_features(self, track_uris):
+        """
+        Audio features (tempo, energy, ...) for up to 100 tracks.
+        Returns:
+            list: One dict per URI, or None where Spotify has no features.
+        """
+        return self.sp.audio_features(track_uris)
 
     def play_track(self, track_uri):
         """
         Play a specific track
         Args:
             track_uri (str): Spotify URI of the track to play
+        Returns:
+            bool: False if Spotify refused (the error is counted in self.sp.stats()).
         """
         try:
             self.sp.start_playback(uris=[track_uri])
-            self.sp.volume(60)
+            self.sp.volume(PLAYBACK_VOLUME)
+            return True
         except Exception as e:
             print(f"Error playing track: {e}")
+            return False
+
+    def get_playback_progress(self):
+        """
+        Returns dict with uri, progress_ms and duration_ms of the playing track,
+        or None if nothing is playing. One current_playback call.
+        """
+        playback = self.sp.current_playback()
+        if not playback or not playback.get('is_playing') or not playback.get('item'):
+            return None
+        return {
+            'uri': playback['item']['uri'],
+            'progress_ms': playback['progress_ms'],
+            'duration_ms': playback['item']['duration_ms']
+        }
 
     def get_remaining_time(self):
         """Returns remaining time in milliseconds, or None if not playing"""
-        playback = self.sp.current_playback()
-        if not playback or not playback.get('is_playing'):
+        progress = self.get_playback_progress()
+        if progress is None:
             return None
-        
-        progress_ms = playback['progress_ms']
-        total_ms = playback['item']['duration_ms']
-        return total_ms - progress_ms
+        return progress['duration_ms'] - progress['progress_ms']
     
     def search_for_song(self, song_name, artist_name):
         """Search for a song by name and artist"""
@@ -0,0 +1,549 @@
+import os
+import time
+import random
+import asyncio
+import threading
+
+from .broadcaster import Broadcaster
+from .http_stream import HttpStationStream
+from .playout import PlayoutScheduler, LocalSink, BroadcastSink, HttpStreamSink
+from .lookahead import LookaheadPipeline, create_lookahead_executor, STATUS_READY
+from .playback_tracker import PlaybackTracker
+from .track_selector import ShuffleBag
+from .track_sequencer import TrackSequencer
+from .queue_events import QueueEventHub
+from .radio_queue import RadioQueue
+from .journal import QueueJournal, journal_path
+from .constants import WARM_START_LINES, WARM_START_FALLBACK
+
+DEFAULT_STATION_ID = "default"
+DEFAULT_PLAYLIST_ID = "0NvNQWJaSUTBTQjhjWbNfL"
+SONGS_PER_BLOCK = 3
+MAX_STATIONS = 32
+SONG_POLL_SECONDS = 0.5
+HAND_OVER_MS = 4000  # hand over to the hosts this close to the song's end
+ITEM_RETRY_SECONDS = 2  # pause after a failed item so a persistent error can't spin the loop
+STATION_IDLE_S = 300    # a station nobody has listened to for this long is closed
+EVICT_INTERVAL_S = 30
+
+FALLBACK_SONG = {"name": "Fallback Song", "artist": "Fallback Artist", "uri": None}
+
+
+class SharedCaches:
+    """
+    Caches shared by every station in the process, so ten listeners on the
+    same article cost one summary. TTS clips are cached on disk by the shared
+    VoiceGenerator and playlists by the shared SpotifyHandler.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.summaries = {}  # article link -> summary
+
+    def summary(self, article, summarise):
+        key = article.get('link') or article.get('title')
+        with self.lock:
+            if key in self.summaries:
+                return self.summaries[key]
+        result = summarise(article)
+        with self.lock:
+            self.summaries[key] = result
+        return result
+
+
+class StationServices:
+    """Process-wide clients and caches that every station borrows."""
+    def __init__(self, clock, decode_pool, voice_generator, audio_player=None,
+                 spotify_handler=None, news_processor=None, dialogue_generator=None,
+                 articles_list=None, dummy_mode=False, caches=None, lookahead_executor=None,
+                 journal_dir=None):
+        self.clock = clock
+        self.decode_pool = decode_pool
+        self.voice_generator = voice_generator
+        self.audio_player = audio_player
+        self.spotify_handler = spotify_handler
+        self.news_processor = news_processor
+        self.dialogue_generator = dialogue_generator
+        self.articles_list = articles_list if articles_list is not None else []
+        self.dummy_mode = dummy_mode
+        self.caches = caches or SharedCaches()
+        self.lookahead_executor = lookahead_executor or create_lookahead_executor()
+        self.journal_dir = journal_dir  # per-station queue journals, or None to keep nothing on disk
+        self.warm_start = None  # [(audio_file, speaker, frames)] once prepare_warm_start() has run
+
+    async def prepare_warm_start(self):
+        """
+        Render the station ident (from the TTS cache after the first run) and
+        decode it up front, so any station can go on air the moment it starts.
+        """
+        try:
+            clips = await asyncio.to_thread(self.voice_generator.generate_files, WARM_START_LINES)
+        except Exception as e:
+            print(f"Could not synthesise the warm-start ident, using a pre-recorded clip: {e}")
+            clips = [(WARM_START_FALLBACK, "matt")] if os.path.exists(WARM_START_FALLBACK) else []
+        self.warm_start = [(audio_file, speaker, await self.decode_pool.decode(audio_file))
+                           for audio_file, speaker in clips]
+        print(f"Warm-start segment ready ({len(self.warm_start)} clips).")
+
+
+class Station:
+    """
+    One independent radio station: its own queue, history, host audio outputs
+    (/ws/host_audio and /stream) and playout timeline. The station loop runs as
+    an asyncio task; blocking work (Spotify, OpenAI, TTS) goes to threads.
+    Only a station created with controls_playback drives the Spotify device and
+    the server's speakers; the others time songs from their track durations.
+    """
+    def __init__(self, station_id, services: StationServices, playlist_id=DEFAULT_PLAYLIST_ID,
+                 controls_playback=False):
+        self.station_id = station_id
+        self.services = services
+        self.playlist_id = playlist_id
+        self.controls_playback = controls_playback
+
+        self.journal = (QueueJournal(journal_path(services.journal_dir, station_id), station_id)
+                        if services.journal_dir else None)
+        self.queue = RadioQueue(self.journal)
+        self.played_songs = set()
+        self.track_bag = self.new_track_selector()
+        self.used_articles = set()
+        self.running = False
+        self.task = None
+
+        clock = services.clock
+        self.broadcaster = Broadcaster(f"{station_id}/host_audio", clock=clock)
+        self.http_stream = HttpStationStream(clock)
+        sinks = [BroadcastSink(self.broadcaster, clock), HttpStreamSink(self.http_stream)]
+        if controls_playback and services.audio_player:
+            sinks.insert(0, LocalSink(services.audio_player, clock))
+        self.playout = PlayoutScheduler(clock, services.decode_pool, sinks)
+        self.lookahead = LookaheadPipeline(self, services.lookahead_executor)
+        self.events = QueueEventHub(self)
+        self.last_active = time.monotonic()  # last time it had a listener or was started
+        self.tracker = (PlaybackTracker(services.spotify_handler, clock.now)
+                        if controls_playback and services.spotify_handler else None)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """
+        (Re)start the station with a fresh queue and return at once: the loop
+        puts the warm-start ident on air and fills the queue in the background.
+        An old loop is stopped first.
+        """
+        await self._halt()
+        self.used_articles.clear()
+        self.played_songs.clear()
+        self.track_bag = self.new_track_selector()
+        self.last_active = time.monotonic()
+        self.queue.mark("start", playlist_id=self.playlist_id)
+        self.events.reset(self.queue.clear())
+
+        self.running = True
+        self.task = asyncio.create_task(self.run())
+
+    async def resume(self, state):
+        """
+        Pick the station back up from its journal after a restart: same queue,
+        history and position, starting again from the item that was on air.
+        Conversations whose audio is still on disk go out without regenerating.
+        """
+        await self._halt()
+        self.playlist_id = state["playlist_id"] or self.playlist_id
+        self.played_songs = set(state["played_songs"])
+        self.used_articles = set(state["used_articles"])
+        self.track_bag = self.new_track_selector()
+        self.track_bag.mark_played(self.played_songs)
+
+        for record in state["items"]:
+            audio = record.get("audio", ())
+            if record.get("status") != STATUS_READY or not all(os.path.exists(f) for f, _ in audio):
+                # Interrupted, failed or its clips were pruned: the lookahead prepares it again
+                record.pop("status", None)
+                record.pop("audio", None)
+        state["current_index"] = max(state["current_index"] - 1, 0)
+        snapshot = self.queue.restore(state)
+        self.events.reset(snapshot)
+        print(f"[{self.station_id}] Restored {snapshot.remaining} queued items from the journal.")
+
+        self.running = True
+        self.task = asyncio.create_task(self.run())
+
+    def handle(self):
+        """Where clients find this station."""
+        return {
+            "station_id": self.station_id,
+            "running": self.running,
+            "host_audio": f"/ws/host_audio?station_id={self.station_id}",
+            "stream": f"/stream?station_id={self.station_id}",
+            "queue": f"/api/queue?station_id={self.station_id}",
+        }
+
+    def listeners(self):
+        """Clients tuned in: host audio websockets, HTTP stream and queue events."""
+        return (len(self.broadcaster.subscribers) + self.http_stream.listeners
+                + len(self.events.subscribers))
+
+    async def stop(self):
+        await self._halt()
+        self.queue.mark("stop")
+
+    async def _halt(self):
+        """Stop the loop without journaling it, so a station shut down with the process resumes."""
+        self.running = False
+        self.lookahead.cancel()
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.task = None
+        # Lines already handed to the playout would otherwise keep airing, and the
+        # next start's ident would queue behind them
+        await self.playout.cancel()
+
+    async def close(self):
+        await self._halt()
+        self.http_stream.close()
+        if self.journal:
+            await asyncio.to_thread(self.journal.close)
+
+    # ------------------------------------------------------------------
+    # Queue building
+    # ------------------------------------------------------------------
+
+    def new_track_selector(self):
+        """Similarity sequencing over the playlist's audio features, or a plain shuffle bag."""
+        spotify = self.services.spotify_handler
+        return TrackSequencer(spotify.features) if spotify else ShuffleBag()
+
+    def next_song(self):
+        services = self.services
+        if services.dummy_mode or not services.spotify_handler:
+            return dict(FALLBACK_SONG)
+        # The cached list is only replaced when the playlist changes, so this is usually a no-op
+        self.track_bag.refresh(services.spotify_handler.playlists.tracks(self.playlist_id))
+        song = self.track_bag.draw()
+        if song is None:
+            print(f"[{self.station_id}] Playlist has no playable tracks.")
+            return dict(FALLBACK_SONG)
+        self.played_songs.add(song['uri'])
+        return song
+
+    def next_article(self):
+        if self.services.dummy_mode or not self.services.articles_list:
+            return {
+                "title": "Dummy Article",
+                "summary": "This is a dummy summary",
+                "link": "http://example.com/dummy",
+                "full_text": "This is dummy full text."
+            }
+        available = [a for a in self.services.articles_list if a['link'] not in self.used_articles]
+        if not available:
+            return {
+                "title": "No More Real Articles",
+                "summary": "No more articles left.",
+                "link": "#",
+                "full_text": "None left."
+            }
+        sel = random.choice(available)
+        self.used_articles.add(sel['link'])
+        return sel
+
+    def next_block(self):
+        """
+        3 songs -> conversation placeholder -> 3 songs -> conversation placeholder,
+        as (type, data) pairs. Blocking (Spotify); the caller appends them to the queue.
+        """
+        entries = []
+        block1 = [self.next_song() for _ in range(SONGS_PER_BLOCK)]
+        entries.extend(("song", s) for s in block1)
+        last_song = block1[-1]
+        entries.append(("conversation_placeholder", {
+            "type": "song_description",
+            "song_name": last_song["name"],
+            "artist": last_song["artist"]
+        }))
+
+        block2 = [self.next_song() for _ in range(SONGS_PER_BLOCK)]
+        entries.extend(("song", s) for s in block2)
+        entries.append(("conversation_placeholder", {
+            "type": "news_description",
+            "article": self.next_article()
+        }))
+        return entries
+
+    def generate_conversation(self, placeholder_data):
+        dialogue_gen = None if self.services.dummy_mode else self.services.dialogue_generator
+        ctype = placeholder_data["type"]
+        if ctype == "song_description":
+            song_name = placeholder_data["song_name"]
+            artist = placeholder_data["artist"]
+            if dialogue_gen:
+                return dialogue_gen.generate_song_dialogue(song_name, artist)
+            return [
+                f"MATT: That was '{song_name}' by {artist}. Always a vibe!",
+                "MOLLIE: Definitely. Let’s keep the party going!"
+            ]
+        elif ctype == "news_description":
+            if dialogue_gen:
+                summary = self.services.caches.summary(placeholder_data["article"],
+                                                       dialogue_gen.summarise_article_for_dialogue)
+                return dialogue_gen.generate_dialogue_for_news(summary)
+            return [
+                "MATT: Some interesting news out there, apparently!",
+                "MOLLIE: Big stuff happening. Next song soon!"
+            ]
+        return ["MATT: Not sure what to talk about.", "MOLLIE: Me neither."]
+
+    # ------------------------------------------------------------------
+    # Station loop
+    # ------------------------------------------------------------------
+
+    async def run(self):
+        print(f"[{self.station_id}] Radio loop started.")
+        try:
+            # On air straight away; the queue is built while the ident plays
+            warm_start_end = await self.start_warm_segment()
+            while self.running:
+                try:
+                    if self.queue.snapshot.remaining <= self.lookahead.depth:
+                        # Top up early so the lookahead always has a full window to prepare
+                        print(f"[{self.station_id}] queue running low, expanding for continuity.")
+                        entries = await asyncio.to_thread(self.next_block)
+                        # Queue writes stay on the loop, so events go out in version order
+                        self.events.inserted(*self.queue.extend(entries))
+                        self.lookahead.poke()
+
+                    if warm_start_end is not None:
+                        await self.services.clock.sleep_until(warm_start_end)
+                        warm_start_end = None
+
+                    snapshot, item = self.queue.advance()
+                    self.events.advanced(snapshot)
+                    # Keep the next few conversations generating while this item airs
+                    self.lookahead.poke()
+
+                    if item.type == "song":
+                        await self.play_song(item.data)
+                        continue
+
+                    ready = await self.lookahead.wait(item)
+                    # The lookahead may have written the script meanwhile
+                    item = self.queue.snapshot.get(item.id) or item
+                    if ready:
+                        print(f"[{self.station_id}] Playing prepared conversation: {ready.data}")
+                        await self.play_segments(ready.audio, ready.data)
+
+                    elif item.type == "conversation_placeholder":
+                        print(f"[{self.station_id}] conversation_placeholder not pre-generated. Doing now.")
+                        speeches = await asyncio.to_thread(self.generate_conversation, item.data)
+                        self.events.updated(*self.queue.update(item.id, type="conversation",
+                                                               data=speeches, context=item.data))
+                        await self.play_dialogues(speeches)
+
+                    elif item.type == "conversation":
+                        print(f"[{self.station_id}] Playing conversation: {item.data}")
+                        await self.play_dialogues(item.data)
+
+                    else:
+                        print(f"[{self.station_id}] Unknown item type: {item.type}. Skipping.")
+                except Exception as e:
+                    # One failed Spotify call, script, TTS line or decode mustn't end the station
+                    print(f"[{self.station_id}] Station loop error, moving on: {e!r}")
+                    await asyncio.sleep(ITEM_RETRY_SECONDS)
+        finally:
+            self.running = False
+            print(f"[{self.station_id}] Radio loop finished.")
+
+    async def start_warm_segment(self):
+        """Schedule the pre-decoded ident; returns its end on the station clock (or None)."""
+        last_segment = None
+        for audio_file, speaker, frames in self.services.warm_start or []:
+            last_segment = await self.playout.schedule(audio_file, speaker, frames)
+        return last_segment.end if last_segment else None
+
+    async def play_song(self, sdata):
+        print(f"[{self.station_id}] Now playing: {sdata['name']} by {sdata['artist']}")
+        spotify = self.services.spotify_handler
+        clock = self.services.clock
+
+        if self.tracker and sdata.get("uri"):
+            await asyncio.to_thread(spotify.play_track, sdata["uri"])
+            # One progress read now, then local predictions with occasional re-syncs
+            await asyncio.to_thread(self.tracker.start, sdata["uri"])
+
+            async def remaining_ms():
+                return await asyncio.to_thread(self.tracker.remaining_ms)
+        elif sdata.get("duration_ms"):
+            # No device to follow: the song slot lasts as long as the track would
+            song_end = clock.now() + sdata["duration_ms"] / 1000
+
+            async def remaining_ms():
+                return (song_end - clock.now()) * 1000
+        else:
+            async def remaining_ms():
+                return None
+
+        while self.running:
+            remaining = await remaining_ms()
+            if remaining is None or remaining <= 0:
+                print(f"[{self.station_id}] Song ended or no playback device. Moving on.")
+                break
+            if remaining < HAND_OVER_MS:
+                break
+            await asyncio.sleep(SONG_POLL_SECONDS)
+
+    async def play_dialogues(self, speeches):
+        """
+        Synthesise TTS lines in a thread and hand each one to this station's
+        playout scheduler as soon as it exists (the next line is synthesised
+        while it airs); return when the last line ends. A TTS error propagates
+        to the station loop.
+        """
+        voice_generator = self.services.voice_generator
+        last_segment = None
+        for i, speech in enumerate(speeches):
+            speaker = voice_generator.voice_for(i)
+            audio_file = await asyncio.to_thread(voice_generator.synthesise, speech, speaker)
+            last_segment = await self.schedule_line(audio_file, speaker, speech)
+
+        if last_segment:
+            await self.services.clock.sleep_until(last_segment.end)
+
+    async def play_segments(self, segments, speeches):
+        """Put already synthesised lines on air back to back; return when the last ends."""
+        last_segment = None
+        for (audio_file, speaker), speech in zip(segments, speeches):
+            last_segment = await self.schedule_line(audio_file, speaker, speech)
+        if last_segment:
+            await self.services.clock.sleep_until(last_segment.end)
+
+    async def schedule_line(self, audio_file, speaker, speech):
+        """
+        Schedule one synthesised line. The shared TTS cache may have pruned the
+        clip since it was made (prepared lines can wait a while to air), in
+        which case it is synthesised again rather than failing the item.
+        """
+        try:
+            return await self.playout.schedule(audio_file, speaker)
+        except Exception:
+            if os.path.exists(audio_file):
+                raise
+        print(f"[{self.station_id}] {audio_file} was pruned before airing, synthesising it again.")
+        audio_file = await asyncio.to_thread(self.services.voice_generator.synthesise, speech, speaker)
+        return await self.playout.schedule(audio_file, speaker)
+
+    def stats(self):
+        snapshot = self.queue.snapshot
+        return {
+            "running": self.running,
+            "playlist_id": self.playlist_id,
+            "controls_playback": self.controls_playback,
+            "queue_length": len(snapshot.items),
+            "current_index": snapshot.current_index,
+            "lookahead": self.lookahead.stats(),
+            "queue_events": self.events.stats(),
+            "journal": self.journal.stats() if self.journal else None,
+            "playback": self.tracker.stats() if self.tracker else None,
+            "track_bag": self.track_bag.stats(),
+            "host_audio": self.broadcaster.stats(),
+            "http_stream": self.http_stream.stats(),
+        }
+
+
+class StationRegistry:
+    """
+    All stations served by this process, keyed by station id. The default
+    station owns the Spotify device and local speakers; every other station
+    is a personalised stream for its own listeners.
+    """
+    def __init__(self, services: StationServices, max_stations=MAX_STATIONS,
+                 idle_timeout=STATION_IDLE_S):
+        self.services = services
+        self.max_stations = max_stations
+        self.idle_timeout = idle_timeout
+        self.stations = {}
+        self.evicted = 0
+        self.evict_task = None
+
+    def get(self, station_id=DEFAULT_STATION_ID):
+        return self.stations.get(station_id)
+
+    async def get_or_create(self, station_id=DEFAULT_STATION_ID, playlist_id=None) -> Station:
+        """Only starting a station creates one; listeners get 404s for unknown ids."""
+        station = self.stations.get(station_id)
+        if station is not None:
+            return station
+        if len(self.stations) >= self.max_stations:
+            await self.evict_idle()
+        if len(self.stations) >= self.max_stations:
+            raise RuntimeError(f"Station limit reached ({self.max_stations})")
+        station = Station(station_id, self.services, playlist_id or DEFAULT_PLAYLIST_ID,
+                          controls_playback=(station_id == DEFAULT_STATION_ID))
+        self.stations[station_id] = station
+        return station
+
+    async def restore_all(self):
+        """Bring back every station that was on air when the process last stopped or crashed."""
+        journal_dir = self.services.journal_dir
+        if not journal_dir or not os.path.isdir(journal_dir):
+            return
+        for name in sorted(os.listdir(journal_dir)):
+            if not name.endswith(".jsonl"):
+                continue
+            state = await asyncio.to_thread(QueueJournal.read, os.path.join(journal_dir, name))
+            if not state or not state["running"]:
+                continue
+            try:
+                station = await self.get_or_create(state["station_id"], state["playlist_id"])
+            except RuntimeError as e:
+                print(f"Not restoring station '{state['station_id']}': {e}")
+                break
+            await station.resume(state)
+
+    def is_idle(self, station, now):
+        """Stopped with nobody listening, or running unheard for idle_timeout."""
+        if station.listeners() or (station.running and station.controls_playback):
+            # The default station is heard on the local speakers while it runs
+            station.last_active = now
+            return False
+        return not station.running or now - station.last_active >= self.idle_timeout
+
+    async def evict_idle(self):
+        now = time.monotonic()
+        for station_id, station in list(self.stations.items()):
+            if self.is_idle(station, now):
+                print(f"[{station_id}] Idle with no listeners, closing station.")
+                await station.stop()  # journaled, so it isn't resumed on restart
+                await self.remove(station_id)
+                self.evicted += 1
+
+    def start_eviction(self, interval=EVICT_INTERVAL_S):
+        async def evict_forever():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.evict_idle()
+                except Exception as e:
+                    print(f"Station eviction failed: {e!r}")
+        self.evict_task = asyncio.create_task(evict_forever())
+
+    async def remove(self, station_id):
+        station = self.stations.pop(station_id, None)
+        if station:
+            await station.close()
+
+    async def close_all(self):
+        if self.evict_task:
+            self.evict_task.cancel()
+        for station_id in list(self.stations):
+            await self.remove(station_id)
+
+    def stats(self):
+        return {
+            "evicted": self.evicted,
+            "stations": {station_id: station.stats() for station_id, station in self.stations.items()},
+        }
@@ -0,0 +1,42 @@
+import time
+import asyncio
+
+PACING_LEAD_S = 0.4  # frames go out this far ahead of their presentation time
+
+
+class StationClock:
+    """
+    Monotonic station time in seconds since the clock was created. Every output
+    stamps and schedules audio against this, never against wall-clock time.
+    """
+    def __init__(self):
+        self._origin = time.monotonic()
+
+    def now(self):
+        return time.monotonic() - self._origin
+
+    async def sleep_until(self, t):
+        delay = t - self.now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FramePacer:
+    """
+    Paces one stream of frames against the station clock. Frame i is released at
+    its presentation timestamp minus a fixed lead, where the timestamp is the
+    stream start plus the durations of all earlier frames. Release times never
+    depend on how long sending took, so the stream cannot drift.
+    """
+    def __init__(self, clock: StationClock, start=None, lead=PACING_LEAD_S):
+        self.clock = clock
+        self.pts = clock.now() if start is None else start
+        self.lead = lead
+
+    async def wait(self):
+        """Sleep until the next frame is due, then return its presentation timestamp."""
+        await self.clock.sleep_until(self.pts - self.lead)
+        return self.pts
+
+    def advance(self, duration):
+        self.pts += duration
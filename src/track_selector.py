@@ -0,0 +1,72 @@
+import random
+from collections import deque
+
+ARTIST_SEPARATION = 3     # no artist repeats within this many songs (0 disables)
+SEPARATION_CANDIDATES = 8  # how deep into the bag a draw looks for a different artist
+
+
+class ShuffleBag:
+    """
+    No-repeat song selection over a (cached) playlist.
+    The playlist is shuffled into a bag once and each draw pops from the end,
+    so a pick is O(1) however long the session runs. History is a set of URIs.
+    When the bag is empty it is refilled and reshuffled, with the most recently
+    played songs placed so they come out last, so a station never runs dry.
+    Draws skip ahead (a bounded number of places) to keep the same artist
+    from playing within `artist_separation` songs.
+    """
+    def __init__(self, tracks=(), artist_separation=ARTIST_SEPARATION, rng=None):
+        self.rng = rng or random.Random()
+        self.artist_separation = artist_separation
+        self.history = set()                                # URIs drawn since the last reshuffle
+        self.recent = deque(maxlen=max(1, artist_separation))  # last few tracks drawn
+        self.tracks = []
+        self.bag = []
+        self.reshuffles = 0
+        self.refresh(tracks)
+
+    def refresh(self, tracks):
+        """Switch to a new track list (e.g. the playlist was edited), keeping history."""
+        if tracks is self.tracks:
+            return
+        self.tracks = tracks
+        self.bag = [track for track in tracks if track['uri'] not in self.history]
+        self.rng.shuffle(self.bag)
+
+    def mark_played(self, uris):
+        """Hold these songs back until the next reshuffle (e.g. history restored after a restart)."""
+        self.history.update(uris)
+        self.bag = [track for track in self.bag if track['uri'] not in self.history]
+
+    def _reshuffle(self):
+        self.history.clear()
+        self.bag = list(self.tracks)
+        self.rng.shuffle(self.bag)
+        # Draws pop from the end, so recently played songs go to the front
+        recent_uris = {track['uri'] for track in self.recent}
+        self.bag.sort(key=lambda track: track['uri'] not in recent_uris)
+        self.reshuffles += 1
+
+    def draw(self):
+        """Next song as a dict (name, artist, uri, duration_ms), or None for an empty playlist."""
+        if not self.bag:
+            if not self.tracks:
+                return None
+            self._reshuffle()
+
+        pick = len(self.bag) - 1
+        if self.artist_separation:
+            recent_artists = {track['artist'] for track in self.recent}
+            for i in range(pick, max(-1, pick - SEPARATION_CANDIDATES), -1):
+                if self.bag[i]['artist'] not in recent_artists:
+                    pick = i
+                    break
+        self.bag[pick], self.bag[-1] = self.bag[-1], self.bag[pick]
+
+        track = self.bag.pop()
+        self.history.add(track['uri'])
+        self.recent.append(track)
+        return dict(track)
+
+    def stats(self):
+        return {"remaining": len(self.bag), "played": len(self.history), "reshuffles": self.reshuffles}
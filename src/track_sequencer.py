@@ -0,0 +1,213 @@
+import os
+import random
+import threading
+from collections import deque
+import numpy as np
+
+from .track_selector import ShuffleBag, ARTIST_SEPARATION
+
+FEATURE_CACHE_PATH = os.path.join(".cache", "track_features.npz")
+FEATURE_NAMES = ("tempo", "energy", "danceability", "valence", "acousticness", "loudness")
+FEATURE_BATCH = 100      # audio-features accepts up to 100 ids per call
+MAX_CACHED_MATRICES = 8
+TOP_K = 8                # candidates the next song is drawn from
+TEMPERATURE = 0.15       # softmax temperature over cosine similarity (lower = smoother mixes)
+RECENT_EXCLUDE = 50      # songs that can't come back right after a reshuffle
+
+
+class FeatureStore:
+    """
+    Per-track audio feature vectors, fetched once from Spotify's audio-features
+    endpoint and persisted by URI to an .npz file, so only new tracks are ever
+    requested. matrix(tracks) returns the playlist's features standardised and
+    L2-normalised (float32, one row per track), so cosine similarity with every
+    track is a single matrix-vector product. Shared by all stations.
+    """
+    def __init__(self, spotify_handler, cache_path=FEATURE_CACHE_PATH):
+        self.spotify = spotify_handler
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.raw = {}        # uri -> np.ndarray of FEATURE_NAMES
+        self.matrices = {}   # id(tracks) -> (tracks, matrix or None)
+        self._load()
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with np.load(self.cache_path) as stored:
+                self.raw = dict(zip(stored["uris"].tolist(), stored["features"]))
+        except Exception as e:
+            print(f"Could not read track feature cache: {e}")
+            self.raw = {}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, uris=np.array(list(self.raw), dtype=str),
+                     features=np.array(list(self.raw.values()), dtype=np.float32))
+        os.replace(tmp_path, self.cache_path)
+
+    def _fetch_missing(self, uris):
+        missing = [uri for uri in uris if uri not in self.raw]
+        for start in range(0, len(missing), FEATURE_BATCH):
+            batch = missing[start:start + FEATURE_BATCH]
+            for uri, features in zip(batch, self.spotify.get_audio_features(batch)):
+                if features:
+                    self.raw[uri] = np.array([features.get(name) or 0.0 for name in FEATURE_NAMES],
+                                             dtype=np.float32)
+        if missing:
+            try:
+                self._save()
+            except Exception as e:
+                print(f"Could not write track feature cache: {e}")
+
+    def matrix(self, tracks):
+        """Normalised feature matrix aligned with `tracks`, or None if features are unavailable."""
+        with self.lock:
+            cached = self.matrices.get(id(tracks))
+            if cached is not None and cached[0] is tracks:
+                return cached[1]
+
+            uris = [track['uri'] for track in tracks]
+            try:
+                self._fetch_missing(uris)
+            except Exception as e:
+                # e.g. apps without access to audio-features: fall back to shuffling
+                print(f"Audio features unavailable, sequencing at random: {e}")
+
+            matrix = None
+            known = [uri in self.raw for uri in uris]
+            if tracks and any(known):
+                raw = np.zeros((len(uris), len(FEATURE_NAMES)), dtype=np.float32)
+                for row, uri in enumerate(uris):
+                    if uri in self.raw:
+                        raw[row] = self.raw[uri]
+                known = np.array(known)
+                # Tracks without features sit at the playlist mean
+                raw[~known] = raw[known].mean(axis=0)
+                std = raw.std(axis=0)
+                matrix = (raw - raw.mean(axis=0)) / np.where(std > 0, std, 1)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = (matrix / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+            self.matrices[id(tracks)] = (tracks, matrix)
+            while len(self.matrices) > MAX_CACHED_MATRICES:
+                self.matrices.pop(next(iter(self.matrices)))
+            return matrix
+
+
+class TrackSequencer:
+    """
+    Picks each next song by similarity to the one that just played, so
+    transitions stay close in tempo and energy. A pick is one matrix-vector
+    product over the playlist, a mask of songs already played this cycle, and a
+    softmax draw among the TOP_K most similar, so it stays random but smooth.
+    The same artist is avoided within `artist_separation` songs where the
+    candidates allow it. Once every song has played the cycle restarts, with
+    the last RECENT_EXCLUDE songs (at most half the playlist, and always the
+    one that just played) still held back. Same interface as ShuffleBag,
+    which it falls back to when no features are available.
+    """
+    def __init__(self, feature_store: FeatureStore, top_k=TOP_K, temperature=TEMPERATURE,
+                 artist_separation=ARTIST_SEPARATION, rng=None):
+        self.features = feature_store
+        self.top_k = top_k
+        self.temperature = temperature
+        self.artist_separation = artist_separation
+        self.rng = rng or np.random.default_rng()
+        self.fallback = ShuffleBag(artist_separation=artist_separation,
+                                   rng=random.Random(int(self.rng.integers(2 ** 32))))
+        self.tracks = []
+        self.columns = None  # (features, tracks): v @ columns is the fastest layout for one row
+        self.penalty = np.zeros(0, dtype=np.float32)  # 0 = can play, -inf = played this cycle
+        self.remaining = 0
+        self.recent = deque(maxlen=RECENT_EXCLUDE)  # row indices, most recent last
+        self.current = None
+        self.cycles = 0
+        self.carried = set()  # URIs marked played before the track list was loaded
+
+    def refresh(self, tracks):
+        """Switch to a new track list (e.g. the playlist was edited), keeping history by URI."""
+        if tracks is self.tracks:
+            return
+        recent_uris = [self.tracks[row]['uri'] for row in self.recent]
+        played = set(recent_uris)
+        played.update(self.tracks[row]['uri'] for row in np.flatnonzero(self.penalty))
+        played.update(self.carried)
+        self.carried.clear()
+        current_uri = self.tracks[self.current]['uri'] if self.current is not None else None
+
+        self.tracks = tracks
+        matrix = self.features.matrix(tracks)
+        self.columns = None if matrix is None else np.ascontiguousarray(matrix.T)
+        self.fallback.refresh(tracks)
+        rows = {track['uri']: row for row, track in enumerate(tracks)}
+        self.penalty = np.array([-np.inf if track['uri'] in played else 0.0 for track in tracks],
+                                dtype=np.float32)
+        self.remaining = int(np.count_nonzero(self.penalty == 0))
+        self.recent = deque((rows[uri] for uri in recent_uris if uri in rows), maxlen=RECENT_EXCLUDE)
+        self.current = rows.get(current_uri)
+
+    def mark_played(self, uris):
+        """Treat these songs as played this cycle (e.g. history restored after a restart)."""
+        self.fallback.mark_played(uris)
+        if not self.tracks:
+            self.carried.update(uris)
+            return
+        uris = set(uris)
+        rows = [row for row, track in enumerate(self.tracks) if track['uri'] in uris]
+        self.penalty[rows] = -np.inf
+        self.remaining = int(np.count_nonzero(self.penalty == 0))
+
+    def _new_cycle(self):
+        self.penalty[:] = 0
+        if len(self.tracks) > 1:
+            # Capped at half the playlist so a short one still has songs to choose from
+            hold = min(len(self.recent), len(self.tracks) // 2)
+            self.penalty[list(self.recent)[len(self.recent) - hold:]] = -np.inf
+            if self.current is not None:
+                self.penalty[self.current] = -np.inf  # never the same song twice in a row
+        self.remaining = int(np.count_nonzero(self.penalty == 0))
+        self.cycles += 1
+
+    def draw(self):
+        """Next song as a dict (name, artist, uri, duration_ms), or None for an empty playlist."""
+        if not self.tracks:
+            return None
+        if self.columns is None:
+            return self.fallback.draw()
+        if not self.remaining:
+            self._new_cycle()
+
+        if self.current is None:
+            pick = int(self.rng.choice(np.flatnonzero(self.penalty == 0)))
+        else:
+            scores = self.columns[:, self.current] @ self.columns
+            scores += self.penalty
+            k = min(self.top_k, self.remaining)
+            top = np.argpartition(scores, len(scores) - k)[-k:]
+
+            if self.artist_separation:
+                recent_artists = {self.tracks[self.recent[-i]]['artist']
+                                  for i in range(1, min(self.artist_separation, len(self.recent)) + 1)}
+                keep = [row for row in top if self.tracks[row]['artist'] not in recent_artists]
+                if keep:
+                    top = np.array(keep)
+
+            weights = np.exp((scores[top] - scores[top].max()) / self.temperature)
+            pick = int(self.rng.choice(top, p=weights / weights.sum()))
+
+        self.penalty[pick] = -np.inf
+        self.remaining -= 1
+        self.recent.append(pick)
+        self.current = pick
+        return dict(self.tracks[pick])
+
+    def stats(self):
+        if self.columns is None:
+            return {"mode": "shuffle", **self.fallback.stats()}
+        return {"mode": "similarity", "remaining": self.remaining, "cycles": self.cycles}
@@ -1,7 +1,10 @@
+import os
 import pygame
 import time
+import threading
 import numpy as np
 from pydub import AudioSegment
+from .audio_analysis import segment_to_array, rms_envelope
 
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 300
@@ -9,10 +12,12 @@ BACKGROUND_COLOUR = (255, 255, 255)
 FPS = 60
 
 WINDOW_SIZE_MS = 100
+ENVELOPE_HOP_MS = 10
 AMPLITUDE_HISTORY_SIZE = 20
 AMPLITUDE_SCALING = 700
 WAVE_FREQUENCY = 1
 WAVE_PHASE_SPEED = 2
+NUM_LAYERS = 4
 
 SPEAKER_COLOURS = {
     'matt': (0, 0, 255),
@@ -20,15 +25,71 @@ SPEAKER_COLOURS = {
     'default': (0, 255, 0)
 }
 
+class WaveRenderer:
+    """
+    Draws the layered sine wave from preallocated coordinate buffers.
+    The sine is a precomputed table that is sliced by phase, and every layer's
+    y-coordinates are written in place, so a frame allocates no NumPy arrays.
+    Each layer reaches pygame as one list built in C by tolist(): handing
+    draw.lines the ndarray itself makes it read every point through the
+    sequence protocol, a row view and two NumPy scalars per point.
+    """
+    def __init__(self, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.width = width
+        self.height = height
+
+        # One wave period in pixels; the table is long enough to slice any phase
+        self.period = max(1, int(round(width / WAVE_FREQUENCY)))
+        x = np.arange(width + self.period, dtype=np.float64)
+        self.sine_table = np.sin(2 * np.pi * WAVE_FREQUENCY * x / width)
+
+        # Layers 0..NUM_LAYERS-1 are the faded outer waves, the last is the main line
+        self.layer_scales = [1.0 - (i * 0.25) for i in range(NUM_LAYERS)] + [1.0]
+        self.points = np.empty((NUM_LAYERS + 1, width, 2), dtype=np.float64)
+        self.points[:, :, 0] = np.linspace(0, width, num=width)
+        self._colours = {}
+
+    def layer_colours(self, colour):
+        colours = self._colours.get(colour)
+        if colours is None:
+            R, G, B = colour
+            colours = []
+            for i in range(NUM_LAYERS):
+                alpha = (i + 1) / (NUM_LAYERS + 1)
+                colours.append((int(R + (255 - R) * alpha),
+                                int(G + (255 - G) * alpha),
+                                int(B + (255 - B) * alpha)))
+            colours.append(colour)
+            self._colours[colour] = colours
+        return colours
+
+    def draw(self, surface, amplitude, phase_shift, colour):
+        offset = int((-phase_shift % 1.0) * self.period) % self.period
+        base_wave = self.sine_table[offset:offset + self.width]
+        centre = self.height / 2
+
+        for i, layer_colour in enumerate(self.layer_colours(colour)):
+            y = self.points[i, :, 1]
+            np.multiply(base_wave, -amplitude * self.layer_scales[i], out=y)
+            y += centre
+            pygame.draw.lines(surface, layer_colour, False, self.points[i].tolist(), 2)
+
+
 class Visualiser:
     def __init__(self):
         self.screen = None
         self.clock = None
-        self.current_audio_samples = None
-        self.current_sample_rate = None
+        self.renderer = WaveRenderer()
+        self.current_envelope = None
         self.current_audio_length = None
         self.current_speaker = None
-        self.amplitude_history = []
+        self._load_id = 0
+
+        # Fixed-size ring buffer for amplitude smoothing (running sum => O(1) mean)
+        self.amplitude_history = np.zeros(AMPLITUDE_HISTORY_SIZE, dtype=np.float64)
+        self.history_index = 0
+        self.history_count = 0
+        self.history_sum = 0.0
 
     def init_display(self):
         pygame.display.init()
@@ -40,79 +101,163 @@ class Visualiser:
         pygame.display.quit()
 
     def reset(self):
-        self.current_audio_samples = None
-        self.current_sample_rate = None
+        self._load_id += 1
+        self.current_envelope = None
         self.current_audio_length = None
         self.current_speaker = None
-        self.amplitude_history = []
+        self._reset_history()
+
+    def _reset_history(self):
+        self.amplitude_history.fill(0.0)
+        self.history_index = 0
+        self.history_count = 0
+        self.history_sum = 0.0
 
     def set_current_audio(self, audio_file, speaker):
-        audio_segment = AudioSegment.from_file(audio_file)
-        audio_samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
-        max_int_value = np.iinfo(np.int16).max
-        audio_samples = audio_samples / max_int_value
-        sample_rate = audio_segment.frame_rate
-        num_channels = audio_segment.channels
-        if num_channels == 2:
-            audio_samples = audio_samples.reshape((-1, 2)).mean(axis=1)
-
-        self.current_audio_samples = audio_samples
-        self.current_sample_rate = sample_rate
-        self.current_audio_length = len(audio_segment)
+        """
+        Start loading the RMS envelope for a clip in the background, so playback
+        isn't held up by the decode. Frames are skipped until it's ready.
+        """
+        self.reset()
         self.current_speaker = speaker
-        self.amplitude_history = []
+        load_id = self._load_id
+        threading.Thread(target=self._load_envelope, args=(audio_file, load_id), daemon=True).start()
+
+    def _load_envelope(self, audio_file, load_id):
+        try:
+            audio_segment = AudioSegment.from_file(audio_file)
+        except Exception as e:
+            print(f"Visualiser could not decode {audio_file}: {e}")
+            return
+        # Mix down to mono before computing the envelope
+        audio_samples = segment_to_array(audio_segment).mean(axis=0)
+        envelope = rms_envelope(audio_samples, audio_segment.frame_rate,
+                                WINDOW_SIZE_MS, ENVELOPE_HOP_MS)
+
+        # A newer clip may have started while we were decoding
+        if load_id != self._load_id:
+            return
+        self.current_audio_length = len(audio_segment)
+        self.current_envelope = envelope
+
+    def _push_amplitude(self, amplitude):
+        self.history_sum += amplitude - self.amplitude_history[self.history_index]
+        self.amplitude_history[self.history_index] = amplitude
+        self.history_index = (self.history_index + 1) % AMPLITUDE_HISTORY_SIZE
+        self.history_count = min(self.history_count + 1, AMPLITUDE_HISTORY_SIZE)
+        return self.history_sum / self.history_count
 
     def update(self, pos_ms):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
 
-        self.screen.fill(BACKGROUND_COLOUR)
-
-        if self.current_audio_samples is not None:
-            self._draw_wave(pos_ms)
+        self.render_frame(self.screen, pos_ms, time.time())
 
         pygame.display.flip()
         self.clock.tick(FPS)
 
-    def _draw_wave(self, pos_ms):
+    def render_frame(self, surface, pos_ms, now):
+        """Draw one frame for playback position `pos_ms` at wall-clock time `now`."""
+        surface.fill(BACKGROUND_COLOUR)
+
+        if self.current_envelope is not None:
+            self._draw_wave(surface, pos_ms, now)
+
+    def _draw_wave(self, surface, pos_ms, now):
         if pos_ms == -1 or pos_ms >= self.current_audio_length:
             return
 
-        current_sample = int(pos_ms * self.current_sample_rate / 1000)
-        window_size_samples = int(self.current_sample_rate * WINDOW_SIZE_MS / 1000)
-        end_sample = min(len(self.current_audio_samples), current_sample + window_size_samples)
-        window_samples = self.current_audio_samples[current_sample:end_sample]
+        envelope_index = pos_ms // ENVELOPE_HOP_MS
+        amplitude = (self.current_envelope[envelope_index]
+                     if envelope_index < len(self.current_envelope) else 0.0)
+        smoothed_amplitude = self._push_amplitude(amplitude) * AMPLITUDE_SCALING
+
+        colour = SPEAKER_COLOURS.get(self.current_speaker, SPEAKER_COLOURS['default'])
+        self.renderer.draw(surface, smoothed_amplitude, now * WAVE_PHASE_SPEED, colour)
 
-        amplitude = np.sqrt(np.mean(window_samples ** 2)) if len(window_samples) > 0 else 0
-        self.amplitude_history.append(amplitude)
-        if len(self.amplitude_history) > AMPLITUDE_HISTORY_SIZE:
-            self.amplitude_history.pop(0)
 
-        smoothed_amplitude = np.mean(self.amplitude_history) * AMPLITUDE_SCALING
+def _legacy_render_frame(surface, samples, sample_rate, history, pos_ms, now):
+    """
+    The renderer before the envelope/ring buffer/coordinate buffer work, kept only
+    so benchmark_frame_time() can compare against it: RMS over raw samples,
+    list-based smoothing and freshly zipped point lists every frame.
+    """
+    surface.fill(BACKGROUND_COLOUR)
+    current_sample = int(pos_ms * sample_rate / 1000)
+    window_samples = samples[current_sample:current_sample + int(sample_rate * WINDOW_SIZE_MS / 1000)]
+    amplitude = np.sqrt(np.mean(window_samples ** 2)) if len(window_samples) > 0 else 0
+    history.append(amplitude)
+    if len(history) > AMPLITUDE_HISTORY_SIZE:
+        history.pop(0)
+    smoothed_amplitude = np.mean(history) * AMPLITUDE_SCALING
 
-        x_positions = np.linspace(0, SCREEN_WIDTH, num=SCREEN_WIDTH)
-        phase_shift = time.time() * WAVE_PHASE_SPEED
-        base_wave = np.sin(2 * np.pi * (WAVE_FREQUENCY * (x_positions / SCREEN_WIDTH) - phase_shift))
+    x_positions = np.linspace(0, SCREEN_WIDTH, num=SCREEN_WIDTH)
+    base_wave = np.sin(2 * np.pi * (WAVE_FREQUENCY * (x_positions / SCREEN_WIDTH)
+                                    - now * WAVE_PHASE_SPEED))
+    colour = SPEAKER_COLOURS['matt']
+    R, G, B = colour
+    for i in range(NUM_LAYERS):
+        alpha = (i + 1) / (NUM_LAYERS + 1)
+        layer_colour = (int(R + (255 - R) * alpha), int(G + (255 - G) * alpha),
+                        int(B + (255 - B) * alpha))
+        layer_y_positions = (SCREEN_HEIGHT / 2) - (smoothed_amplitude * (1.0 - i * 0.25) * base_wave)
+        pygame.draw.lines(surface, layer_colour, False, list(zip(x_positions, layer_y_positions)), 2)
+    main_y_positions = (SCREEN_HEIGHT / 2) - (smoothed_amplitude * base_wave)
+    pygame.draw.lines(surface, colour, False, list(zip(x_positions, main_y_positions)), 2)
 
-        colour = SPEAKER_COLOURS.get(self.current_speaker, SPEAKER_COLOURS['default'])
-        R, G, B = colour
-        num_layers = 4
-        for i in range(num_layers):
-            alpha = (i + 1) / (num_layers + 1)
-            layer_R = int(R + (255 - R) * alpha)
-            layer_G = int(G + (255 - G) * alpha)
-            layer_B = int(B + (255 - B) * alpha)
-            layer_colour = (layer_R, layer_G, layer_B)
-
-            scale = 1.0 - (i * 0.25)
-            layer_amp = smoothed_amplitude * scale
-            layer_y_positions = (SCREEN_HEIGHT / 2) - (layer_amp * base_wave)
-            layer_points = list(zip(x_positions, layer_y_positions))
-
-            pygame.draw.lines(self.screen, layer_colour, False, layer_points, 2)
-
-        # Draw main wave line
-        main_y_positions = (SCREEN_HEIGHT / 2) - (smoothed_amplitude * base_wave)
-        main_points = list(zip(x_positions, main_y_positions))
-        pygame.draw.lines(self.screen, colour, False, main_points, 2)
+
+def _frame_times(render, num_frames):
+    frame_ms = 1000 / FPS
+    timings = np.empty(num_frames, dtype=np.float64)
+    for i in range(num_frames):
+        start = time.perf_counter()
+        render(int(i * frame_ms), i / FPS)
+        timings[i] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def benchmark_frame_time(num_frames=1200, clip_seconds=10):
+    """
+    Render frames offscreen as fast as possible with the old and the current
+    renderer, report both, and fail if the current one's p99 frame time
+    doesn't fit the 60 FPS budget. Run with: python -m src.visualiser
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    # Synthetic speech-like audio so the benchmark needs no audio files
+    rng = np.random.default_rng(0)
+    sample_rate = 24000
+    samples = rng.normal(0, 0.15, clip_seconds * sample_rate)
+    clip_ms = clip_seconds * 1000
+
+    visualiser = Visualiser()
+    visualiser.current_envelope = rms_envelope(samples, sample_rate, WINDOW_SIZE_MS, ENVELOPE_HOP_MS)
+    visualiser.current_audio_length = clip_ms
+    visualiser.current_speaker = 'matt'
+
+    history = []
+    results = {
+        "old": _frame_times(lambda pos_ms, now: _legacy_render_frame(
+            surface, samples, sample_rate, history, pos_ms % clip_ms, now), num_frames),
+        "new": _frame_times(lambda pos_ms, now: visualiser.render_frame(
+            surface, pos_ms % clip_ms, now), num_frames),
+    }
+    pygame.display.quit()
+
+    frame_ms = 1000 / FPS
+    print(f"Frames: {num_frames}, budget at {FPS} FPS: {frame_ms:.2f} ms")
+    for name, timings in results.items():
+        p99 = np.percentile(timings, 99)
+        print(f"{name:>4} frame time ms: mean={timings.mean():.3f} p50={np.median(timings):.3f} "
+              f"p99={p99:.3f} max={timings.max():.3f} -> p99 headroom {frame_ms / p99:.1f}x")
+    new_p99 = np.percentile(results["new"], 99)
+    print(f"p99 speed-up: {np.percentile(results['old'], 99) / new_p99:.1f}x")
+    assert new_p99 < frame_ms, f"p99 frame time {new_p99:.2f} ms is over the {frame_ms:.2f} ms budget"
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_frame_time()
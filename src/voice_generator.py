@@ -1,9 +1,19 @@
 import os
+import hashlib
 import tempfile
 from openai import OpenAI
 
+TTS_MODEL = "tts-1"
+MAX_TTS_CACHE_FILES = 500
+
 class VoiceGenerator:
-    def __init__(self):
+    def __init__(self, loudness=None, cache_dir=None):
+        self.loudness = loudness  # optional LoudnessAnalyser, run as each clip is generated
+        # Optional persistent TTS cache (shared by every station in the process).
+        # Cached clips live outside /tmp, so the player never deletes them.
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
         self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         self.voice_mapping = {
             'matt': 'echo',
@@ -12,23 +22,77 @@ class VoiceGenerator:
 
     def generate_to_queue(self, speeches, output_queue):
         """Generate audio files from speeches and put them into a queue as they become available."""
-        for i, speech in enumerate(speeches):
-            voice_type = 'matt' if i % 2 == 0 else 'mollie'
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=self.voice_mapping[voice_type],
-                input=speech,
-            )
-
-            # Name temp file with speaker info for clarity
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{voice_type}.mp3")
-            for chunk in response.iter_bytes():
-                temp_file.write(chunk)
-            temp_file.flush()
-            temp_file.close()
-
-            # Put filename and speaker to queue
-            output_queue.put((temp_file.name, voice_type))
-
-        # Signal no more speeches
-        output_queue.put(None)
+        try:
+            for i, speech in enumerate(speeches):
+                voice_type = self.voice_for(i)
+                audio_file = self.synthesise(speech, voice_type)
+
+                # Put filename and speaker to queue
+                output_queue.put((audio_file, voice_type))
+        finally:
+            # Signal no more speeches, even after a TTS error, so the consumer never waits forever
+            output_queue.put(None)
+
+    def generate_files(self, speeches):
+        """Generate every line up front. Returns [(audio_file, speaker), ...] in order."""
+        return [(self.synthesise(speech, self.voice_for(i)), self.voice_for(i))
+                for i, speech in enumerate(speeches)]
+
+    @staticmethod
+    def voice_for(index):
+        """The hosts take turns, starting with Matt."""
+        return 'matt' if index % 2 == 0 else 'mollie'
+
+    def synthesise(self, speech, voice_type):
+        """Generate one line of speech and return the MP3 path (cached if a cache dir is set)."""
+        voice = self.voice_mapping[voice_type]
+        cached = self._cache_path(speech, voice, voice_type)
+        if cached and os.path.exists(cached):
+            os.utime(cached)  # keep recently used clips at the back of the eviction order
+            return cached
+
+        response = self.client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=speech,
+        )
+
+        # Name temp file with speaker info for clarity
+        suffix = ".part" if cached else f"_{voice_type}.mp3"
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=self.cache_dir)
+        for chunk in response.iter_bytes():
+            temp_file.write(chunk)
+        temp_file.flush()
+        temp_file.close()
+        audio_file = temp_file.name
+        if cached:
+            # Atomic, so another station never reads a half-written clip
+            os.replace(audio_file, cached)
+            audio_file = cached
+            self._prune_cache()
+
+        # Analyse loudness now so playback only needs a cache lookup
+        if self.loudness:
+            try:
+                self.loudness.analyse_file(audio_file)
+            except Exception as e:
+                print(f"Loudness analysis failed for {audio_file}: {e}")
+        return audio_file
+
+    def _cache_path(self, speech, voice, voice_type):
+        if not self.cache_dir:
+            return None
+        key = hashlib.sha1(f"{TTS_MODEL}|{voice}|{speech}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}_{voice_type}.mp3")
+
+    def _prune_cache(self):
+        clips = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir)
+                 if f.endswith(".mp3")]
+        if len(clips) <= MAX_TTS_CACHE_FILES:
+            return
+        clips.sort(key=lambda path: os.path.getmtime(path))
+        for path in clips[:len(clips) - MAX_TTS_CACHE_FILES]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
@@ -0,0 +1,151 @@
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+main = pytest.importorskip("main")
+
+from fastapi.testclient import TestClient
+
+from src.constants import WARM_START_LINES
+from src.host_audio import HOST_SAMPLE_RATE
+from src.journal import QueueJournal, journal_path
+from src.radio_queue import RadioQueue
+from src.playout import PlayoutScheduler
+from src.voice_generator import VoiceGenerator
+
+STATION = "test"
+FRAME = (bytes(int(HOST_SAMPLE_RATE * 0.05) * 2), bytes(4))  # 50 ms of silence
+
+
+class FakeVoiceGenerator:
+    """Every line is "synthesised" at once; the decode pool below makes it 50 ms of silence."""
+    voice_for = staticmethod(VoiceGenerator.voice_for)
+
+    def generate_files(self, speeches):
+        return [(f"{speech}.mp3", VoiceGenerator.voice_for(i)) for i, speech in enumerate(speeches)]
+
+    def synthesise(self, speech, voice_type):
+        return "line.mp3"
+
+
+class FakeDecodePool:
+    async def decode(self, audio_file):
+        return [FRAME]
+
+    def shutdown(self):
+        pass
+
+
+def wait_for(predicate, timeout=5.0):
+    """Poll while the app's event loop (in the TestClient's thread) gets on with it."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path / "stations")
+
+
+@pytest.fixture
+def app(journal_dir, monkeypatch):
+    """The real app and lifespan, with offline services instead of Spotify/OpenAI/audio."""
+    def init_services():
+        monkeypatch.setattr(main, "dummy_mode", True)
+        monkeypatch.setattr(main, "voice_generator", FakeVoiceGenerator())
+        monkeypatch.setattr(main, "decode_pool", FakeDecodePool())
+
+    monkeypatch.setattr(main, "init_services", init_services)
+    monkeypatch.setattr(main, "STATION_JOURNAL_DIR", journal_dir)
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    with TestClient(app) as client:
+        yield client
+
+
+def test_start_radio_creates_the_station(client):
+    params = {"station_id": STATION}
+    assert client.get("/api/queue/events", params=params).status_code == 404
+
+    response = client.post("/api/start_radio", params=params)
+    assert response.status_code == 200
+    assert response.json()["stream"] == f"/stream?station_id={STATION}"
+    assert main.stations.get(STATION).running
+    assert wait_for(lambda: client.get("/api/queue", params=params).json()["queue"])
+    assert STATION in client.get("/api/stats").json()["stations"]["stations"]
+
+    assert client.post("/api/stop_radio", params=params).status_code == 200
+    assert not main.stations.get(STATION).running
+
+
+def test_lifespan_warms_up_and_starts_background_tasks(client):
+    assert wait_for(lambda: main.stations.services.warm_start is not None)
+    assert [clip[0] for clip in main.stations.services.warm_start] == \
+           [f"{line}.mp3" for line in WARM_START_LINES]
+    assert wait_for(lambda: main.loop_monitor.stats()["samples"] > 0)
+    assert not main.stations.evict_task.done()
+
+
+def test_start_radio_puts_the_ident_on_air_first(client, monkeypatch):
+    scheduled = []
+    schedule = PlayoutScheduler.schedule
+
+    async def record_schedule(self, audio_file, speaker, frames=None):
+        scheduled.append(audio_file)
+        return await schedule(self, audio_file, speaker, frames)
+
+    monkeypatch.setattr(PlayoutScheduler, "schedule", record_schedule)
+    assert wait_for(lambda: main.stations.services.warm_start is not None)
+    assert client.post("/api/start_radio", params={"station_id": STATION}).status_code == 200
+    assert wait_for(lambda: len(scheduled) > len(WARM_START_LINES))
+    assert scheduled[:len(WARM_START_LINES)] == [f"{line}.mp3" for line in WARM_START_LINES]
+
+
+def test_stopped_stations_are_evicted(client):
+    params = {"station_id": STATION}
+    client.post("/api/start_radio", params=params)
+    client.post("/api/stop_radio", params=params)
+
+    client.portal.call(main.stations.evict_idle)
+    assert main.stations.get(STATION) is None
+    assert client.get("/api/queue/events", params=params).status_code == 404
+
+
+def write_journal(journal_dir, station_id, advances, stopped=False):
+    """A journal as a previous process would have left it."""
+    journal = QueueJournal(journal_path(journal_dir, station_id), station_id)
+    queue = RadioQueue(journal)
+    queue.mark("start", playlist_id="playlist")
+    queue.extend([("song", {"uri": f"spotify:track:{i}", "name": f"Song {i}", "artist": "Artist"})
+                  for i in range(4)])
+    for _ in range(advances):
+        queue.advance()
+    if stopped:
+        queue.mark("stop")
+    journal.close()
+
+
+def test_lifespan_restores_stations_that_were_on_air(app, journal_dir):
+    write_journal(journal_dir, "crashed", advances=2)
+    write_journal(journal_dir, "stopped", advances=1, stopped=True)
+
+    with TestClient(app) as client:
+        station = main.stations.get("crashed")
+        assert station is not None and station.running
+        assert station.playlist_id == "playlist"
+        assert main.stations.get("stopped") is None
+
+        def ids():
+            return [row["id"] for row in client.get("/api/queue", params={"station_id": "crashed"})
+                    .json()["queue"]]
+        # Picks up from the song that was on air, then tops up with fresh ids after the old ones
+        assert wait_for(lambda: len(ids()) > 4)
+        assert ids() == list(range(len(ids())))
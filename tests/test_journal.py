@@ -0,0 +1,94 @@
+import pytest
+
+from src.journal import QueueJournal
+from src.radio_queue import RadioQueue
+
+
+def songs(*names):
+    return [("song", {"uri": f"spotify:track:{name}", "name": name}) for name in names]
+
+
+def journaled_queue(path, compact_every=256):
+    journal = QueueJournal(str(path), "test", compact_every=compact_every)
+    queue = RadioQueue(journal)
+    queue.mark("start", playlist_id="playlist")
+    return queue, journal
+
+
+def assert_matches(state, snapshot):
+    """The replayed items from the one on air onwards equal the live queue's."""
+    live = snapshot.items[max(snapshot.current_index - 1, 0):]
+    replayed = state["items"][max(state["current_index"] - 1, 0):]
+    assert [(item.id, dict(item.data), item.status) for item in live] == \
+           [(record["id"], record["data"], record.get("status")) for record in replayed]
+
+
+def test_replay_ignores_a_truncated_last_line(tmp_path):
+    path = tmp_path / "test.jsonl"
+    queue, journal = journaled_queue(path)
+    queue.extend(songs("a", "b", "c"))
+    snapshot, _ = queue.advance()
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"op":"advance","version":9,"next_')  # crash mid-write
+
+    state = QueueJournal.read(str(path))
+    assert state["running"] and state["playlist_id"] == "playlist"
+    assert state["current_index"] == snapshot.current_index
+    assert_matches(state, snapshot)
+
+
+def test_replay_after_compaction(tmp_path):
+    path = tmp_path / "test.jsonl"
+    queue, journal = journaled_queue(path, compact_every=3)
+    queue.extend(songs("a", "b", "c", "d"))
+    for _ in range(3):
+        queue.advance()
+    queue.update(3, status="ready")
+    snapshot, _ = queue.extend(songs("e"))
+    journal.close()
+
+    assert journal.compactions > 0 and journal.errors == 0
+    state = QueueJournal.read(str(path))
+    assert state["version"] == snapshot.version
+    assert state["played_songs"] == {f"spotify:track:{name}" for name in "abcde"}
+    assert_matches(state, snapshot)
+
+
+def test_restored_queue_continues_item_ids(tmp_path):
+    path = tmp_path / "test.jsonl"
+    queue, journal = journaled_queue(path, compact_every=2)
+    queue.extend(songs("a", "b", "c"))
+    queue.advance()
+    queue.advance()
+    journal.close()
+
+    state = QueueJournal.read(str(path))
+    assert state["next_item_id"] == 3
+    journal = QueueJournal(str(path), "test", compact_every=2)
+    restored = RadioQueue(journal)
+    restored.restore(state)
+    _, items = restored.extend(songs("d", "e"))
+    assert [item.id for item in items] == [3, 4]
+
+    snapshot, _ = restored.advance()
+    journal.close()
+    state = QueueJournal.read(str(path))
+    assert state["next_item_id"] == 5
+    assert_matches(state, snapshot)
+
+
+def test_item_data_is_frozen_all_the_way_down(tmp_path):
+    article = {"link": "https://example.com/a", "tags": ["news"]}
+    queue, journal = journaled_queue(tmp_path / "test.jsonl")
+    _, (item,) = queue.extend([("conversation_placeholder",
+                                {"type": "news_description", "article": article})])
+    article["tags"].append("edited")  # the caller's dict stays the caller's
+    journal.close()
+
+    assert item.data["article"]["tags"] == ("news",)
+    with pytest.raises(TypeError):
+        item.data["article"]["link"] = "https://example.com/b"
+    state = QueueJournal.read(str(tmp_path / "test.jsonl"))
+    assert state["items"][0]["data"]["article"] == {"link": "https://example.com/a", "tags": ["news"]}
+    assert state["used_articles"] == {"https://example.com/a"}
@@ -0,0 +1,60 @@
+import json
+import asyncio
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from src.lookahead import LookaheadPipeline, STATUS_GENERATING
+from src.queue_events import QueueEventHub
+from src.radio_queue import RadioQueue
+
+
+class FakeStation:
+    """Just what the lookahead touches: a queue, its event hub and a TTS that waits to be released."""
+    station_id = "test"
+
+    def __init__(self, release):
+        self.queue = RadioQueue()
+        self.events = QueueEventHub(self)
+        self.services = SimpleNamespace(voice_generator=SimpleNamespace(
+            generate_files=lambda speeches: release.wait() and []))
+
+
+def published(subscriber):
+    """(event kind, payload) for every message the hub sent to one subscriber."""
+    events = []
+    while not subscriber.empty():
+        kind, data = subscriber.get_nowait().strip().split("\n")
+        events.append((kind[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_cancelled_job_publishes_the_status_reset():
+    release = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def prepare_then_cancel():
+        station = FakeStation(release)
+        pipeline = LookaheadPipeline(station, executor)
+        station.queue.extend([("conversation", ["MATT: Hi.", "MOLLIE: Hello."])])
+        subscriber = asyncio.Queue()
+        station.events.subscribers.add(subscriber)
+
+        pipeline.poke()
+        job = pipeline.jobs[0]
+        await asyncio.sleep(0.05)  # running: "generating" is out and TTS is in progress
+        pipeline.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+        return station, published(subscriber)
+
+    try:
+        station, events = asyncio.run(prepare_then_cancel())
+    finally:
+        release.set()
+        executor.shutdown()
+
+    assert [kind for kind, _ in events] == ["update", "update"]
+    assert events[0][1]["item"]["status"] == STATUS_GENERATING
+    assert "status" not in events[1][1]["item"]
+    assert events[1][1]["version"] == station.queue.snapshot.version
+    assert station.queue.snapshot.get(0).status is None
@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip("spotipy")
+
+from src.spotify_client import RateLimitedSpotify, create_spotify
+
+
+class FakeClock:
+    """Passed in as the client's clock/sleep so the bucket's waits are instant and recorded."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def spotify_server():
+    """Local HTTP server that answers with the queued (status, headers, body) responses in order."""
+    responses = []
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            status, headers, body = responses.pop(0)
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1/", responses, hits
+    server.shutdown()
+
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
+
+
+def client_for(prefix, clock):
+    sp = create_spotify(auth="test-token")
+    sp.prefix = prefix
+    return RateLimitedSpotify(sp, clock=clock.monotonic, sleep=clock.sleep)
+
+
+def test_429_waits_for_retry_after(spotify_server, fake_clock):
+    prefix, responses, hits = spotify_server
+    responses.append((429, {"Retry-After": "7"}, {"error": {"status": 429, "message": "slow down"}}))
+    responses.append((200, {}, {"snapshot_id": "abc"}))
+
+    result = client_for(prefix, fake_clock).playlist("p1", fields="snapshot_id")
+
+    assert result == {"snapshot_id": "abc"}
+    assert len(hits) == 2  # one 429, no retry inside spotipy/urllib3, then the retry here
+    assert fake_clock.sleeps == [pytest.approx(7.0)]
+
+
+def test_5xx_is_still_retried_by_the_transport(spotify_server, fake_clock):
+    prefix, responses, hits = spotify_server
+    responses.append((503, {}, {"error": {"status": 503, "message": "unavailable"}}))
+    responses.append((200, {}, {"snapshot_id": "abc"}))
+
+    assert client_for(prefix, fake_clock).playlist("p1", fields="snapshot_id") == {"snapshot_id": "abc"}
+    assert len(hits) == 2
+    assert fake_clock.sleeps == []
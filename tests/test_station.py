@@ -0,0 +1,40 @@
+import queue
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from src.station import Station, StationServices
+from src.station_clock import StationClock
+from src.voice_generator import VoiceGenerator
+
+
+class FailingVoiceGenerator(VoiceGenerator):
+    """A VoiceGenerator whose TTS is down (no OpenAI client needed)."""
+    def __init__(self):
+        self.cache_dir = None
+
+    def synthesise(self, speech, voice_type):
+        raise RuntimeError("TTS unavailable")
+
+
+def test_generate_to_queue_ends_the_queue_on_a_tts_error():
+    q = queue.Queue()
+    with pytest.raises(RuntimeError):
+        FailingVoiceGenerator().generate_to_queue(["MATT: Hi.", "MOLLIE: Hello."], q)
+    assert q.get_nowait() is None
+
+
+def test_play_dialogues_raises_tts_errors_instead_of_hanging():
+    async def play():
+        services = StationServices(StationClock(), decode_pool=None,
+                                   voice_generator=FailingVoiceGenerator())
+        station = Station("test", services)
+        try:
+            await asyncio.wait_for(station.play_dialogues(["MATT: Hi.", "MOLLIE: Hello."]), 5)
+        finally:
+            services.lookahead_executor.shutdown(wait=False)
+
+    with pytest.raises(RuntimeError, match="TTS unavailable"):
+        asyncio.run(play())
@@ -0,0 +1,38 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.track_sequencer import TrackSequencer
+
+
+class FakeFeatureStore:
+    """Random unit feature vectors instead of Spotify's audio-features."""
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+
+    def matrix(self, tracks):
+        matrix = self.rng.normal(size=(len(tracks), 6)).astype(np.float32)
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def playlist(size):
+    return [{"name": f"Song {i}", "artist": f"Artist {i % 2}", "uri": f"spotify:track:{i}",
+             "duration_ms": 180000} for i in range(size)]
+
+
+@pytest.mark.parametrize("size", [2, 3, 5, 12])
+def test_small_playlists_never_repeat_back_to_back(size):
+    sequencer = TrackSequencer(FakeFeatureStore(), rng=np.random.default_rng(size))
+    sequencer.refresh(playlist(size))
+
+    uris = [sequencer.draw()["uri"] for _ in range(size * 20)]
+    assert sequencer.cycles > 1
+    assert all(previous != uri for previous, uri in zip(uris, uris[1:]))
+    # Each full pass still plays every song once
+    assert sorted(uris[:size]) == sorted(track["uri"] for track in playlist(size))
+
+
+def test_single_track_playlist_keeps_playing():
+    sequencer = TrackSequencer(FakeFeatureStore(), rng=np.random.default_rng(0))
+    sequencer.refresh(playlist(1))
+    assert [sequencer.draw()["uri"] for _ in range(3)] == ["spotify:track:0"] * 3
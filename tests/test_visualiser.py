@@ -0,0 +1,58 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pygame = pytest.importorskip("pygame")
+pytest.importorskip("pydub")
+
+from src.visualiser import (WaveRenderer, SPEAKER_COLOURS, BACKGROUND_COLOUR,
+                            SCREEN_WIDTH, SCREEN_HEIGHT)
+
+COLOUR = SPEAKER_COLOURS['matt']
+
+
+def blank_surface():
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    surface.fill(BACKGROUND_COLOUR)
+    return surface
+
+
+def rgb(surface, x, y):
+    return tuple(surface.get_at((x, y)))[:3]
+
+
+def test_point_buffers_are_reused_between_frames():
+    renderer = WaveRenderer()
+    points = renderer.points
+    address = points.__array_interface__["data"][0]
+    colours = renderer.layer_colours(COLOUR)
+
+    surface = blank_surface()
+    for frame in range(3):
+        renderer.draw(surface, 50.0 + frame, frame / 10, COLOUR)
+    assert renderer.points is points
+    assert points.__array_interface__["data"][0] == address
+    assert renderer.layer_colours(COLOUR) is colours
+    # The x coordinates are written once and never touched again
+    assert np.array_equal(points[:, :, 0], np.broadcast_to(np.linspace(0, SCREEN_WIDTH, SCREEN_WIDTH),
+                                                           points[:, :, 0].shape))
+
+
+def test_zero_amplitude_draws_the_centre_line():
+    surface = blank_surface()
+    WaveRenderer().draw(surface, 0.0, 0.3, COLOUR)
+
+    centre = SCREEN_HEIGHT // 2
+    for x in range(0, SCREEN_WIDTH - 1, 50):
+        # Width 2, so the main line (drawn last) covers the centre row or the one above
+        assert COLOUR in (rgb(surface, x, centre), rgb(surface, x, centre - 1))
+        assert rgb(surface, x, 0) == BACKGROUND_COLOUR
+        assert rgb(surface, x, SCREEN_HEIGHT - 1) == BACKGROUND_COLOUR
+
+
+def test_amplitude_moves_the_wave_off_centre():
+    surface = blank_surface()
+    renderer = WaveRenderer()
+    renderer.draw(surface, 100.0, 0.0, COLOUR)
+    main_line = renderer.points[-1, :, 1]
+    assert main_line.min() == pytest.approx(SCREEN_HEIGHT / 2 - 100.0, abs=0.5)
+    assert main_line.max() == pytest.approx(SCREEN_HEIGHT / 2 + 100.0, abs=0.5)